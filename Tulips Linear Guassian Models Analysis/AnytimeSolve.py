@@ -0,0 +1,76 @@
+from gurobipy import *
+
+'''
+Anytime solve policy: per-call wall-clock and MIP-gap budgets for any Gurobi model, so a per-step
+planning loop (e.g. the AAAI-17 rollout) never stalls on one slow solve
+    - optimize(model) sets TimeLimit/MIPGap, streams every improving incumbent to onIncumbent as
+      {"Time", "Objective", "Bound", "Plan"} from a MIPSOL callback, and returns the best plan found with
+      its proven bound when the budget expires
+    - Every call is recorded in self.results; a solve is "Truncated" when it stopped before proving
+      optimality to Gurobi's default gap (time limit hit, or stopped early by a looser gapLimit)
+    - V2 models take a policy in solve(policy) / solveAsync(executor, policy)
+NOTES:
+    - The plan holds planVars (all named variables by default); LPs have no MIPSOL callbacks, so
+      only the final solution is reported for them
+'''
+
+DefaultGap = 1e-4
+
+class SolvePolicy:
+    def __init__(self, timeLimit = None, gapLimit = None, onIncumbent = None, planVars = None):
+        self.timeLimit = timeLimit
+        self.gapLimit = gapLimit
+        self.onIncumbent = onIncumbent
+        self.planVars = planVars
+        self.results = list()
+
+    def getPlanVars(self, model):
+        if self.planVars is None:
+            return [v for v in model.getVars() if v.VarName]
+        return [model.getVarByName(varName) for varName in self.planVars]
+
+    def optimize(self, model, label = None):
+        if self.timeLimit is not None:
+            model.setParam("TimeLimit", self.timeLimit)
+        if self.gapLimit is not None:
+            model.setParam("MIPGap", self.gapLimit)
+        planVars = self.getPlanVars(model)
+        incumbents = list()
+
+        def callback(model, where):
+            if where == GRB.Callback.MIPSOL:
+                values = model.cbGetSolution(planVars)
+                incumbent = {"Time": model.cbGet(GRB.Callback.RUNTIME),
+                             "Objective": model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                             "Bound": model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                             "Plan": dict((v.VarName, value) for v, value in zip(planVars, values))}
+                incumbents.append(incumbent)
+                if self.onIncumbent is not None:
+                    self.onIncumbent(incumbent)
+
+        model.optimize(callback)
+        result = {"Label": label if label is not None else model.ModelName,
+                  "Status": model.Status,
+                  "Runtime": model.Runtime,
+                  "Incumbents": len(incumbents),
+                  "Time Limit Hit": model.Status == GRB.TIME_LIMIT,
+                  "Objective": None, "Bound": None, "Gap": None, "Plan": None}
+        if model.SolCount > 0:
+            result["Objective"] = model.objVal
+            result["Plan"] = dict((v.VarName, v.x) for v in planVars)
+            if model.IsMIP:
+                result["Bound"] = model.ObjBound
+                result["Gap"] = model.MIPGap
+            else:
+                result["Bound"] = model.objVal
+                result["Gap"] = 0.0
+        result["Truncated"] = (model.Status != GRB.OPTIMAL or result.get("Gap") is None
+                               or result.get("Gap") > DefaultGap)
+        self.results.append(result)
+        return result
+
+    def getTruncated(self):
+        return [result for result in self.results if result.get("Truncated")]
+
+    def getTruncatedRate(self):
+        return len(self.getTruncated())/max(len(self.results), 1)
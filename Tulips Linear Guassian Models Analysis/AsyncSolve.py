@@ -0,0 +1,69 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gurobipy import *
+
+'''
+Two-phase solves for the V2 models: construct with lazy = True (inputs only, no Gurobi work), then
+model.solveAsync(executor) returns a concurrent.futures.Future that resolves to the solved model
+    - The default executor is one shared thread pool (Gurobi releases the GIL while optimizing, so
+      threads overlap solves with each other and with sampling in the caller)
+    - asCompleted yields solved models in completion order, pipeline also evaluates each one, and
+      solveAwaitable wraps the future for asyncio callers
+    - A Gurobi Env must not be used by two threads at once, so the V2 models create their Gurobi model in
+      the Env of the thread that builds it (getThreadEnv, one quiet Env per thread); a lazy model built
+      by solveAsync therefore lives in the Env of its pool thread
+    - For the same reason pipeline runs evaluate in the pool thread right after the solve, so the caller
+      never reads a Gurobi model while another solve runs in its Env; evaluate should return plain values
+    - The default pool has one thread per core, so executor jobs solve with Threads = 1 unless the
+      model's solverParams set Threads (cpu_count concurrent solves at the default Threads would run
+      cores^2 solver threads)
+'''
+
+DefaultExecutor = None
+ExecutorLock = threading.Lock()
+ThreadEnvs = threading.local()
+
+def getThreadEnv():
+    env = getattr(ThreadEnvs, "env", None)
+    if env is None:
+        env = Env(empty = True)
+        env.setParam("OutputFlag", 0)
+        env.start()
+        ThreadEnvs.env = env
+    return env
+
+def getDefaultExecutor():
+    global DefaultExecutor
+    with ExecutorLock:
+        if DefaultExecutor is None:
+            DefaultExecutor = ThreadPoolExecutor(max_workers = os.cpu_count())
+    return DefaultExecutor
+
+# With evaluate, the job returns (model, evaluate(model)), evaluated in the thread that solved it
+def runSolve(model, policy, evaluate = None):
+    if "Threads" not in model.solverParams:
+        model.solverParams = dict(model.solverParams, Threads = 1)
+        if model.built:
+            model.model.setParam("Threads", 1)
+    model.solve(policy)
+    return model if evaluate is None else (model, evaluate(model))
+
+def submitSolve(model, executor = None, policy = None, evaluate = None):
+    executor = getDefaultExecutor() if executor is None else executor
+    return executor.submit(runSolve, model, policy, evaluate)
+
+def asCompleted(futures, timeout = None):
+    for future in as_completed(futures, timeout = timeout):
+        yield future.result()
+
+# Solves every model concurrently and yields (model, evaluate(model)) as each solve finishes; evaluate
+# runs in the pool thread that solved the model, so it reads the Gurobi model in that thread's Env
+def pipeline(models, evaluate, executor = None):
+    futures = [submitSolve(model, executor, None, evaluate) for model in models]
+    for model, value in asCompleted(futures):
+        yield model, value
+
+async def solveAwaitable(model, executor = None):
+    return await asyncio.wrap_future(submitSolve(model, executor))
@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from ConfidenceIntervals import getWilsonIntervals, getRequiredFrequencyTrials
 
 class BinaryVariablePlot:
     
@@ -7,17 +8,35 @@ class BinaryVariablePlot:
         self.name = name 
         self.samples = np.asarray(samples)
         self.ratios = list()
+        self.positives = list()
+        self.totals = list()
+        self.intervals = None
 
     def addRatio(self, binaryVars):
-        pos = binaryVars.count(0.0)
+        binaryVars = np.asarray(binaryVars, dtype = float)
+        pos = np.count_nonzero(binaryVars == 0.0)
         tot = len(binaryVars)
+        self.positives.append(pos)
+        self.totals.append(tot)
         self.ratios.append(pos/tot)
+        self.intervals = None
+        
+    def computeIntervals(self, level = 0.95):
+        self.intervals = getWilsonIntervals(self.positives, self.totals, level)
+        return self.intervals
+    
+    # Trials per n needed for the ratio's interval half-width to be at most halfWidth
+    def getRequiredTrials(self, halfWidth, level = 0.95):
+        return getRequiredFrequencyTrials(self.ratios, halfWidth, level)
         
     def plot(self, colour):
         plt.title(self.name + " Confidence Ratio")
         plt.xlabel('Number of Samples (n)')
         plt.ylabel(self.name)
         y = np.asarray(self.ratios)
+        if self.intervals is None:
+            self.computeIntervals()
         plt.plot(self.samples, y, colour)   
+        plt.fill_between(self.samples, self.intervals[0], self.intervals[1], facecolor = colour, alpha = 0.3)
         plt.grid()
         plt.show()
\ No newline at end of file
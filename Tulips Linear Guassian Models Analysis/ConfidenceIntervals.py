@@ -0,0 +1,78 @@
+import numpy as np
+from statistics import NormalDist
+
+'''
+Confidence intervals for the per-n buckets of the plot aggregators
+    - getBootstrapIntervals resamples every bucket at once: the resample indices for all buckets are one
+      (buckets x resamples x trials) integer matrix, and buckets with fewer trials than the largest are
+      handled by masking the padded columns, so there is no Python loop over buckets or resamples
+    - getWilsonIntervals is the closed-form Wilson score interval for frequencies (Tulip Type, Outdoor?)
+    - getRequiredTrials gives the trials per n needed for a target half-width, from the bucket stdevs;
+      getRequiredFrequencyTrials solves the Wilson half-width for n, so frequencies of 0 or 1 (where
+      the normal approximation asks for 0 trials) still get a requirement
+NOTES:
+    - Bootstrap intervals are percentile intervals
+    - Empty buckets (no trials) get NaN bounds in both interval types, without NumPy warnings
+'''
+
+def getZ(level):
+    return NormalDist().inv_cdf(0.5 + level/2)
+
+# buckets is a list of 1-d arrays; returns {statistic: (lower, upper)} arrays over buckets
+def getBootstrapIntervals(buckets, statistics = ("mean", "stdev"), resamples = 1000, level = 0.95, randomSeed = None):
+    rng = np.random.default_rng(randomSeed)
+    counts = np.array([len(bucket) for bucket in buckets], dtype = int)
+    empty = counts == 0
+    width = max(int(np.max(counts, initial = 0)), 1)
+    padded = np.zeros((len(buckets), width))
+    for row, bucket in enumerate(buckets):
+        padded[row, :len(bucket)] = bucket
+    mask = np.arange(width)[None, :] < counts[:, None]
+
+    indices = (rng.random((len(buckets), resamples, width))*counts[:, None, None]).astype(np.int64)
+    drawn = np.take_along_axis(padded[:, None, :], indices, axis = 2)*mask[:, None, :]
+    # Empty buckets draw index 0 of an all-zero row; they are divided by 1 and masked below
+    sizes = np.maximum(counts, 1)[:, None]
+    means = np.sum(drawn, axis = 2)/sizes
+
+    intervals = {}
+    tail = 100*(1 - level)/2
+    for statistic in statistics:
+        if statistic == "mean":
+            values = means
+        elif statistic == "stdev":
+            values = np.sqrt(np.maximum(np.sum(drawn**2, axis = 2)/sizes - means**2, 0.0))
+        else:
+            raise ValueError("Unknown bootstrap statistic: " + str(statistic))
+        lower, upper = np.percentile(values, [tail, 100 - tail], axis = 1)
+        intervals[statistic] = (np.where(empty, np.nan, lower), np.where(empty, np.nan, upper))
+    return intervals
+
+def getWilsonIntervals(successes, totals, level = 0.95):
+    successes = np.asarray(successes, dtype = float)
+    totals = np.asarray(totals, dtype = float)
+    z = getZ(level)
+    empty = totals <= 0
+    totals = np.where(empty, 1.0, totals)
+    successes = np.where(empty, 0.0, successes)
+    p = successes/totals
+    centre = (p + z**2/(2*totals))/(1 + z**2/totals)
+    halfWidth = z*np.sqrt(p*(1 - p)/totals + z**2/(4*totals**2))/(1 + z**2/totals)
+    return np.where(empty, np.nan, centre - halfWidth), np.where(empty, np.nan, centre + halfWidth)
+
+# Trials needed so the normal interval half-width of a mean is at most halfWidth; a bucket with no
+# observed spread still needs 2 trials to estimate one
+def getRequiredTrials(stdevs, halfWidth, level = 0.95):
+    return np.maximum(np.ceil((getZ(level)*np.asarray(stdevs)/halfWidth)**2), 2).astype(int)
+
+# Trials needed so the Wilson half-width at frequency p is at most halfWidth: the larger root of
+# h^2 (n + z^2)^2 = z^2 (p(1 - p) n + z^2/4), which stays positive at p = 0 or 1
+def getRequiredFrequencyTrials(frequencies, halfWidth, level = 0.95):
+    z = getZ(level)
+    pq = np.asarray(frequencies, dtype = float)*(1 - np.asarray(frequencies, dtype = float))
+    h = float(halfWidth)
+    n = z**2*(pq - 2*h**2 + np.sqrt(h**2*(1 - 4*pq) + pq**2))/(2*h**2)
+    return np.maximum(np.ceil(n - 1e-9), 1).astype(int)
+
+def isBinary(values):
+    return np.all((values == 0) | (values == 1))
@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from ConfidenceIntervals import getBootstrapIntervals, getRequiredTrials
 
 class ContinuousVariablePlot:
     
@@ -8,10 +9,24 @@ class ContinuousVariablePlot:
         self.samples = np.asarray(samples)
         self.avgs = list()
         self.stdevs = list()
+        self.values = list()
+        self.intervals = None
         
     def addAvgAndStdev(self, continuousVars):
+        continuousVars = np.asarray(continuousVars, dtype = float)
+        self.values.append(continuousVars)
         self.avgs.append(np.mean(continuousVars))
         self.stdevs.append(np.std(continuousVars))
+        self.intervals = None
+        
+    # Bootstrap intervals of the average and the standard deviation for every n in one resampling pass
+    def computeIntervals(self, resamples = 1000, level = 0.95, randomSeed = 0):
+        self.intervals = getBootstrapIntervals(self.values, ("mean", "stdev"), resamples, level, randomSeed)
+        return self.intervals
+    
+    # Trials per n needed for the average's interval half-width to be at most halfWidth
+    def getRequiredTrials(self, halfWidth, level = 0.95):
+        return getRequiredTrials(self.stdevs, halfWidth, level)
         
     def getFillColour(self, colour):
         if colour == 'b':
@@ -27,16 +42,22 @@ class ContinuousVariablePlot:
             fig, (avgAx, stdAx) = plt.subplots(1,2, figsize = (15, 5), sharey = False, sharex = True)
             y = np.asarray(self.avgs)
             error = np.asarray(self.stdevs)
+            if self.intervals is None:
+                self.computeIntervals()
+            avgLower, avgUpper = self.intervals.get("mean")
+            stdLower, stdUpper = self.intervals.get("stdev")
             
             avgAx.set_title(self.name + " Average")
             avgAx.set_xlabel('Number of Samples (n)')
             avgAx.set_ylabel(self.name + " Average")
             avgAx.plot(self.samples, y, colour)  
             avgAx.fill_between(self.samples, y - error, y + error, facecolor= self.getFillColour(colour))
+            avgAx.fill_between(self.samples, avgLower, avgUpper, facecolor = colour, alpha = 0.4)
             avgAx.grid()
             
             stdAx.set_title(self.name + " Standard Deviation")
             stdAx.set_xlabel('Number of Samples (n)')
             stdAx.set_ylabel(self.name + " Standard Deviation")
             stdAx.plot(self.samples, error, colour)  
+            stdAx.fill_between(self.samples, stdLower, stdUpper, facecolor = self.getFillColour(colour))
             stdAx.grid()
\ No newline at end of file
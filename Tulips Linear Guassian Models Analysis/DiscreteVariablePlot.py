@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from ConfidenceIntervals import getBootstrapIntervals, getWilsonIntervals, getRequiredTrials, getRequiredFrequencyTrials, isBinary
 
 class DiscreteVariablePlot:
     
@@ -7,15 +8,38 @@ class DiscreteVariablePlot:
         self.name = name 
         self.samples = np.asarray(samples)
         self.avgs = list()
+        self.values = list()
+        self.intervals = None
         
     def addAvg(self, discreteVars):
+        discreteVars = np.asarray(discreteVars, dtype = float)
+        self.values.append(discreteVars)
         self.avgs.append(np.mean(discreteVars))
+        self.intervals = None
+        
+    # Wilson intervals when every value is 0/1 (decision frequencies), bootstrap intervals of the average otherwise
+    def computeIntervals(self, resamples = 1000, level = 0.95, randomSeed = 0):
+        if all(isBinary(values) for values in self.values):
+            self.intervals = getWilsonIntervals([np.sum(values) for values in self.values],
+                                                [len(values) for values in self.values], level)
+        else:
+            self.intervals = getBootstrapIntervals(self.values, ("mean",), resamples, level, randomSeed).get("mean")
+        return self.intervals
+    
+    # Trials per n needed for the average's interval half-width to be at most halfWidth
+    def getRequiredTrials(self, halfWidth, level = 0.95):
+        if all(isBinary(values) for values in self.values):
+            return getRequiredFrequencyTrials(self.avgs, halfWidth, level)
+        return getRequiredTrials([np.std(values) for values in self.values], halfWidth, level)
         
     def plot(self, colour):
         plt.title(self.name + " Average")
         plt.xlabel('Number of Samples (n)')
         plt.ylabel(self.name)
         y = np.asarray(self.avgs)
+        if self.intervals is None:
+            self.computeIntervals()
         plt.plot(self.samples, y, colour)   
+        plt.fill_between(self.samples, self.intervals[0], self.intervals[1], facecolor = colour, alpha = 0.3)
         plt.grid()
         plt.show()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import numpy as np
+from StemFlowerRootsModelV2 import RedParams, PurpleParams, CostParams
+
+'''
+Large-garden mode: many tulips (of fixed or free variety) sharing one money and one water budget
+    max  sum_i weight_i*E[stem_i + flower_i + roots_i]
+    s.t. sum_i cost_i <= moneyBudget, sum_i water_i <= waterBudget, per-plant StemFlowerRootsModel rows
+NOTES:
+    - The shared budget rows are dualised. Each plant's Lagrangian subproblem is enumerable: the
+      expected reward and the costs are linear in water for a fixed (type, outdoor, pellets), so the
+      optimum is at a water bound and there are 16*2 candidate plans per plant. All plants are solved
+      at once as one (plants x candidates) NumPy argmax
+    - Multipliers are updated by Polyak subgradient steps on the budget rows scaled to 1
+    - The last Lagrangian plan is repaired to a feasible plan by greedy downgrades (least reward lost
+      per unit of violated budget), then slack is used by greedy upgrades and a final water fill
+    - The expectation ignores the truncation of the leaf area at 0, as in the "Expected" model objective
+    - status is "Unsolved", "Feasible" or "Infeasible" (no repair fits the shared budgets); getPlan,
+      getObj and getDualityGap return None unless a feasible plan was found
+'''
+
+class GardenSolver:
+    def __init__(self, varieties, moneyBudget, waterBudget, weights = None,
+                 redParams = RedParams, purpleParams = PurpleParams, costParams = CostParams):
+        # varieties[i] is 1 (red), 0 (purple) or -1 (free choice)
+        self.varieties = np.asarray(varieties, dtype = int)
+        self.plants = len(self.varieties)
+        self.weights = np.ones(self.plants) if weights is None else np.asarray(weights, dtype = float)
+        self.budgets = np.array([moneyBudget, waterBudget], dtype = float)
+        self.redParams = redParams
+        self.purpleParams = purpleParams
+        self.costParams = costParams
+        self.plan = None
+        self.status = "Unsolved"
+        self.buildCandidates()
+
+    def getReward(self, params, outdoor, pellets, water):
+        leaf = (params.get("Leaf Base Avg") + params.get("Leaf Water Ratio Avg")*water
+                + params.get("Leaf Outdoor Ratio Avg")*outdoor + params.get("Leaf Pellets Ratio Avg")*pellets)
+        flower = (params.get("Flower Base Avg") + params.get("Flower Water Ratio Avg")*water
+                  + params.get("Flower Outdoor Ratio Avg")*outdoor)
+        roots = (params.get("Roots Base Avg") + params.get("Roots Pellets Ratio Avg")*pellets
+                 + params.get("Roots Outdoor Ratio Avg")*outdoor)
+        return 0.1*leaf + flower + roots
+
+    def buildCandidates(self):
+        plans = list()
+        for tulipType in [0, 1]:
+            for outdoor in [0, 1]:
+                for pellets in [2, 3, 4, 5]:
+                    for water in [max(250, 200*pellets), 1000]:
+                        plans.append((tulipType, outdoor, pellets, water))
+        self.plans = np.array(plans, dtype = float)
+        tulipType, outdoor, pellets, water = self.plans.T
+        self.rewards = np.where(tulipType == 1,
+                                self.getReward(self.redParams, outdoor, pellets, water),
+                                self.getReward(self.purpleParams, outdoor, pellets, water))
+        money = (np.where(tulipType == 1, self.costParams.get("Red Tulip"), self.costParams.get("Purple Tulip"))
+                 + self.costParams.get("Water")*water + self.costParams.get("Outdoor")*(1 - outdoor)
+                 + self.costParams.get("Pellets")*pellets)
+        self.usage = np.stack([money, water], axis = 1)
+        # Plant x candidate values, with candidates of the wrong variety excluded
+        allowed = (self.varieties[:, None] < 0) | (self.varieties[:, None] == tulipType[None, :])
+        self.values = np.where(allowed, self.weights[:, None]*self.rewards[None, :], -np.inf)
+
+    def solveSubproblems(self, multipliers):
+        scaled = self.usage @ (multipliers/self.budgets)
+        lagrangian = self.values - scaled[None, :]
+        choice = np.argmax(lagrangian, axis = 1)
+        dual = np.sum(lagrangian[np.arange(self.plants), choice]) + np.sum(multipliers)
+        return choice, dual
+
+    def getUsage(self, choice):
+        return np.sum(self.usage[choice], axis = 0)
+
+    def getValue(self, choice):
+        return np.sum(self.values[np.arange(self.plants), choice])
+
+    def solve(self, iterations = 200, stepScale = 2.0, patience = 10, repairEvery = 10):
+        multipliers = np.zeros(2)
+        self.upperBound = np.inf
+        self.lowerBound = -np.inf
+        self.plan = None
+        stalled = 0
+        for iteration in range(iterations):
+            choice, dual = self.solveSubproblems(multipliers)
+            if dual < self.upperBound - 1e-9:
+                self.upperBound = dual
+                stalled = 0
+            else:
+                stalled += 1
+                if stalled >= patience:
+                    stepScale /= 2
+                    stalled = 0
+
+            if iteration % repairEvery == 0 or iteration == iterations - 1:
+                repaired = self.repair(choice)
+                if repaired is not None and self.getValue(repaired) > self.lowerBound:
+                    self.lowerBound = self.getValue(repaired)
+                    self.plan = repaired
+            if self.upperBound - self.lowerBound <= 1e-6*max(1.0, abs(self.lowerBound)):
+                break
+
+            # Polyak step on the scaled budget rows
+            subgradient = 1 - self.getUsage(choice)/self.budgets
+            norm = np.sum(subgradient**2)
+            if norm == 0:
+                break
+            target = self.lowerBound if np.isfinite(self.lowerBound) else 0.95*dual
+            step = stepScale*(dual - target)/norm
+            multipliers = np.maximum(multipliers - step*subgradient, 0.0)
+        self.multipliers = multipliers
+        self.water = self.fillWater(self.plan) if self.plan is not None else None
+        self.status = "Infeasible" if self.plan is None else "Feasible"
+        return self.plan
+
+    # Greedy downgrades until both shared budgets hold, then greedy upgrades into the slack
+    def repair(self, choice):
+        choice = choice.copy()
+        rows = np.arange(self.plants)
+        # Downgrades in sweeps: in order of loss per unit of violated budget, until the running usage fits
+        while True:
+            violation = self.getUsage(choice) - self.budgets
+            if np.all(violation <= 1e-9):
+                break
+            saving = (self.usage[choice][:, None, :] - self.usage[None, :, :]) @ ((violation > 0)/self.budgets)
+            loss = self.values[rows, choice][:, None] - self.values
+            ratio = np.where(saving > 1e-12, loss/np.where(saving > 1e-12, saving, 1), np.inf)
+            best = np.argmin(ratio, axis = 1)
+            bestRatio = ratio[rows, best]
+            if not np.any(np.isfinite(bestRatio)):
+                return None
+            for plant in np.argsort(bestRatio):
+                if not np.isfinite(bestRatio[plant]) or np.all(violation <= 1e-9):
+                    break
+                violation += self.usage[best[plant]] - self.usage[choice[plant]]
+                choice[plant] = best[plant]
+
+        # Upgrades in sweeps: every plant's best upgrade that fits the current slack, applied in order of
+        # gain while the running slack still allows it; a plant skipped or upgraded is revisited next sweep
+        while True:
+            slack = self.budgets - self.getUsage(choice)
+            extra = self.usage[None, :, :] - self.usage[choice][:, None, :]
+            fits = np.all(extra <= slack[None, None, :] + 1e-9, axis = 2)
+            gain = np.where(fits, self.values - self.values[rows, choice][:, None], -np.inf)
+            best = np.argmax(gain, axis = 1)
+            bestGain = gain[rows, best]
+            upgraded = False
+            for plant in np.argsort(-bestGain):
+                if bestGain[plant] <= 1e-12:
+                    break
+                cost = self.usage[best[plant]] - self.usage[choice[plant]]
+                if np.all(cost <= slack + 1e-9):
+                    choice[plant] = best[plant]
+                    slack -= cost
+                    upgraded = True
+            if not upgraded:
+                break
+        return choice
+
+    # Water is continuous: spend the remaining slack on the plants whose reward grows fastest with water
+    def fillWater(self, choice):
+        water = self.plans[choice, 3].copy()
+        tulipType = self.plans[choice, 0]
+        slope = self.weights*np.where(tulipType == 1,
+                                      0.1*self.redParams.get("Leaf Water Ratio Avg") + self.redParams.get("Flower Water Ratio Avg"),
+                                      0.1*self.purpleParams.get("Leaf Water Ratio Avg") + self.purpleParams.get("Flower Water Ratio Avg"))
+        slack = self.budgets - self.getUsage(choice)
+        for plant in np.argsort(-slope):
+            if slope[plant] <= 0 or slack[0] <= 1e-9 or slack[1] <= 1e-9:
+                break
+            # Plants already at 1000 mL are skipped; only running out of shared slack ends the fill
+            room = min(1000 - water[plant], slack[0]/self.costParams.get("Water"), slack[1])
+            if room <= 0:
+                continue
+            water[plant] += room
+            slack -= np.array([self.costParams.get("Water")*room, room])
+        return water
+
+    def getPlan(self):
+        if self.plan is None:
+            return None
+        plan = self.plans[self.plan].copy()
+        plan[:, 3] = self.water
+        return plan
+
+    def getObj(self):
+        plan = self.getPlan()
+        if plan is None:
+            return None
+        rewards = np.where(plan[:, 0] == 1,
+                           self.getReward(self.redParams, plan[:, 1], plan[:, 2], plan[:, 3]),
+                           self.getReward(self.purpleParams, plan[:, 1], plan[:, 2], plan[:, 3]))
+        return np.sum(self.weights*rewards)
+
+    def getDualityGap(self):
+        if self.plan is None:
+            return None
+        return self.upperBound - self.getObj()
@@ -5,22 +5,153 @@ from StemFlowerRootsModelV1 import StemFlowerRootsModel
 from BinaryVariablePlot import BinaryVariablePlot
 from DiscreteVariablePlot import DiscreteVariablePlot
 from ContinuousVariablePlot import ContinuousVariablePlot
+from NestedSampleStream import NestedSampleStream
+from RewardEvaluator import RewardEvaluator
+from SolutionVerifier import SolutionVerifier
+import StemModelV2
+import StemFlowerModelV2
+import StemFlowerRootsModelV2
 
 StemPlots = {}
 StemFlowerPlots = {}
 StemFlowerRootsPlots = {}
+Verifications = {}
 
-def generateStemModels(samples, trials):
+# How each plot key is read off a solved model
+PlotValues = {"Tulip Type": lambda model, trials, analyticReward: model.getVar("Tulip Type"),
+              "Amount of Water": lambda model, trials, analyticReward: model.getVar("Amount of Water/week (mL)"),
+              "Outdoor": lambda model, trials, analyticReward: model.getVar("Outdoor?"),
+              "Pellets": lambda model, trials, analyticReward: model.getVar("Number of Fertilizer Pellets"),
+              "Objective Function Value": lambda model, trials, analyticReward: model.getObj(),
+              "Sampled Reward": lambda model, trials, analyticReward: getReward(model, trials, analyticReward),
+              "Runtime": lambda model, trials, analyticReward: model.getRunTime(),
+              "Optimization Time": lambda model, trials, analyticReward: model.getOptimizationTime(),
+              "Simplex Iterations": lambda model, trials, analyticReward: model.getSimplexIters()}
+
+# The analytic reward is the exact expectation of getSampleReward, computed without sampling
+def getReward(model, trials, analyticReward):
+    if analyticReward:
+        return RewardEvaluator(model).getExpectedReward()
+    return model.getSampleReward(trials)
+
+# Model family by version: the V1 models solve in the constructor from a seed only, the V2 models also
+# take sample streams and solver parameters, so the nested and scheduled sweeps need version 2. Every
+# plot title reports the version
+StemModels = {1: StemModel, 2: StemModelV2.StemModel}
+StemFlowerModels = {1: StemFlowerModel, 2: StemFlowerModelV2.StemFlowerModel}
+StemFlowerRootsModels = {1: StemFlowerRootsModel, 2: StemFlowerRootsModelV2.StemFlowerRootsModel}
+
+def checkSweepVersion(version, nested, scheduler):
+    if version not in (1, 2):
+        raise ValueError("version must be 1 or 2, got " + repr(version))
+    if nested and version != 2:
+        raise ValueError("The nested sweep needs the V2 models (sample streams); pass version = 2")
+    if scheduler is not None and version != 2:
+        raise ValueError("The scheduled sweep needs the V2 models (solver parameters); pass version = 2")
+
+def getVersionName(name, version):
+    return name + " (V" + str(version) + ")"
+
+# V1 models are recorded from their variables and checked against the V1 coefficients
+def getRecord(model, version):
+    if version == 1:
+        return SolutionVerifier.getVariableRecord(model)
+    return model.getSolutionRecord()
+
+def getVerifier(modelClass, version):
+    return SolutionVerifier.fromV1(modelClass) if version == 1 else None
+
+# Every sweep keeps a solution record per model and verifies them all in one pass at the end; V1 sweeps
+# record the variables only and are checked against the V1 coefficients
+def verifySweep(label, sampleModel, records, verifier = None):
+    verifier = SolutionVerifier.fromModel(sampleModel) if verifier is None else verifier
+    Verifications[label] = verifier.verify(records)
+    verifier.printSummary()
+
+# Nested sweep: each trial walks the grid of n with one prefix-consistent sample stream and one model,
+# so the sample for each n extends the previous one and the previous optimum is the warm start
+def generateNestedModels(modelClass, plots, label, samples, trials, analyticReward = False):
+    values = dict((n, dict((key, list()) for key in plots)) for n in samples)
+    records = list()
     
+    i = 0
+    while i < trials:
+        stream = NestedSampleStream(np.random.randint(10e6))
+        sampleModel = None
+        for n in samples:
+            if sampleModel is None:
+                name = label + " at i = " + str(i) + " (nested)"
+                sampleModel = modelClass(name, None, n, stream)
+            else:
+                sampleModel.extendSamples(n)
+            for key in plots:
+                values[n][key].append(PlotValues.get(key)(sampleModel, trials, analyticReward))
+            records.append(sampleModel.getSolutionRecord())
+        i += 1
+        
+    for n in samples:
+        for key in plots:
+            if isinstance(plots.get(key), ContinuousVariablePlot):
+                plots.get(key).addAvgAndStdev(values[n][key])
+            else:
+                plots.get(key).addAvg(values[n][key])
+    print("Generated " + str(trials) + " nested " + label + " sweeps over " + str(len(samples)) + " values of n")
+    verifySweep(label, sampleModel, records)
+
+# Scheduled sweep: every (n, trial) model is solved through the scheduler, which picks Threads/Method
+# per solve and runs as many solves concurrently as the core budget allows. The plot values and the
+# solution record are read in the pool thread that solved the model (its Gurobi Env may be solving
+# the next model while this thread collects results)
+def generateScheduledModels(modelClass, plots, label, samples, trials, scheduler, analyticReward = False):
+    futures = dict((n, list()) for n in samples)
+    records = list()
+    evaluate = lambda model: (model, dict((key, PlotValues.get(key)(model, trials, analyticReward)) for key in plots),
+                              model.getSolutionRecord())
+    for n in samples:
+        i = 0
+        while i < trials:
+            name = label + " at i = " + str(i) + " and n = " + str(n)
+            seed = np.random.randint(10e6)
+            build = lambda solverParams, name = name, seed = seed, n = n: modelClass(name, seed, n, solverParams = solverParams)
+            futures[n].append(scheduler.submit(label, build, evaluate))
+            i += 1
+    
+    for n in samples:
+        values = dict((key, list()) for key in plots)
+        for future in futures[n]:
+            sampleModel, modelValues, record = future.result()
+            for key in plots:
+                values[key].append(modelValues.get(key))
+            records.append(record)
+        for key in plots:
+            if isinstance(plots.get(key), ContinuousVariablePlot):
+                plots.get(key).addAvgAndStdev(values[key])
+            else:
+                plots.get(key).addAvg(values[key])
+        futures[n] = None
+        print("Generated " + str(trials) +  " scheduled " + label + " models for n = " + str(n))
+    scheduler.printThroughput()
+    verifySweep(label, sampleModel, records)
+    
+def generateStemModels(samples, trials, nested = False, analyticReward = False, scheduler = None, version = 1):
+    checkSweepVersion(version, nested, scheduler)
     StemPlots.clear()
-    StemPlots.setdefault("Tulip Type", DiscreteVariablePlot("Tulip Type", samples))
-    StemPlots.setdefault("Amount of Water", ContinuousVariablePlot("Amount of Water/week (mL)", samples))
-    StemPlots.setdefault("Objective Function Value", ContinuousVariablePlot("Objective Function Value", samples))
-    StemPlots.setdefault("Sampled Reward", ContinuousVariablePlot("Sampled Reward", samples))
-    StemPlots.setdefault("Runtime", DiscreteVariablePlot("Total Runtime (s)", samples))
-    StemPlots.setdefault("Optimization Time", DiscreteVariablePlot("Optimization Time (s)", samples))
-    StemPlots.setdefault("Simplex Iterations", DiscreteVariablePlot("Number of Simplex Iterations", samples))
+    StemPlots.setdefault("Tulip Type", DiscreteVariablePlot(getVersionName("Tulip Type", version), samples))
+    StemPlots.setdefault("Amount of Water", ContinuousVariablePlot(getVersionName("Amount of Water/week (mL)", version), samples))
+    StemPlots.setdefault("Objective Function Value", ContinuousVariablePlot(getVersionName("Objective Function Value", version), samples))
+    StemPlots.setdefault("Sampled Reward", ContinuousVariablePlot(getVersionName("Sampled Reward", version), samples))
+    StemPlots.setdefault("Runtime", DiscreteVariablePlot(getVersionName("Total Runtime (s)", version), samples))
+    StemPlots.setdefault("Optimization Time", DiscreteVariablePlot(getVersionName("Optimization Time (s)", version), samples))
+    StemPlots.setdefault("Simplex Iterations", DiscreteVariablePlot(getVersionName("Number of Simplex Iterations", version), samples))
     
+    if nested:
+        generateNestedModels(StemModels.get(version), StemPlots, "Model 1", samples, trials, analyticReward)
+        return
+    if scheduler is not None:
+        generateScheduledModels(StemModels.get(version), StemPlots, "Model 1", samples, trials, scheduler, analyticReward)
+        return
+    
+    records = list()
     for n in samples:
         
         TulipType = list()
@@ -34,14 +165,15 @@ def generateStemModels(samples, trials):
         i = 0
         while i < trials:
             name = "Model 1 at i = " + str(i) + " and n = " + str(n)
-            sampleModel = StemModel(name, np.random.randint(10e6), n)
+            sampleModel = StemModels.get(version)(name, np.random.randint(10e6), n)
             TulipType.append(sampleModel.getVar("Tulip Type"))
             Water.append(sampleModel.getVar("Amount of Water/week (mL)"))
             Obj.append(sampleModel.getObj())
-            Reward.append(sampleModel.getSampleReward(trials))
+            Reward.append(getReward(sampleModel, trials, analyticReward))
             Runtime.append(sampleModel.getRunTime())
             OptTime.append(sampleModel.getOptimizationTime())
             SimplexIter.append(sampleModel.getSimplexIters())
+            records.append(getRecord(sampleModel, version))
             i += 1
             
         StemPlots.get("Tulip Type").addAvg(TulipType)
@@ -51,22 +183,31 @@ def generateStemModels(samples, trials):
         StemPlots.get("Runtime").addAvg(Runtime)
         StemPlots.get("Optimization Time").addAvg(OptTime)
         StemPlots.get("Simplex Iterations").addAvg(SimplexIter)
-        print("Generated " + str(trials) +  " Stem Models for n = " + str(n))
+        print("Generated " + str(trials) +  " " + getVersionName("Stem Models", version) + " for n = " + str(n))
         
+    verifySweep("Model 1", sampleModel, records, getVerifier(StemModels.get(version), version))
     print("Completed generating all Stem Models.")
     
-def generateStemFlowerModels(samples, trials):
-    
+def generateStemFlowerModels(samples, trials, nested = False, analyticReward = False, scheduler = None, version = 1):
+    checkSweepVersion(version, nested, scheduler)
     StemFlowerPlots.clear()
-    StemFlowerPlots.setdefault("Tulip Type", DiscreteVariablePlot("Tulip Type", samples))
-    StemFlowerPlots.setdefault("Amount of Water", ContinuousVariablePlot("Amount of Water/week (mL)", samples))
-    StemFlowerPlots.setdefault("Outdoor", DiscreteVariablePlot("Outdoors", samples))
-    StemFlowerPlots.setdefault("Objective Function Value", ContinuousVariablePlot("Objective Function Value", samples))
-    StemFlowerPlots.setdefault("Sampled Reward", ContinuousVariablePlot("Sampled Reward", samples))
-    StemFlowerPlots.setdefault("Runtime", DiscreteVariablePlot("Total Runtime (s)", samples))
-    StemFlowerPlots.setdefault("Optimization Time", DiscreteVariablePlot("Optimization Time (s)", samples))
-    StemFlowerPlots.setdefault("Simplex Iterations", DiscreteVariablePlot("Number of Simplex Iterations", samples))
+    StemFlowerPlots.setdefault("Tulip Type", DiscreteVariablePlot(getVersionName("Tulip Type", version), samples))
+    StemFlowerPlots.setdefault("Amount of Water", ContinuousVariablePlot(getVersionName("Amount of Water/week (mL)", version), samples))
+    StemFlowerPlots.setdefault("Outdoor", DiscreteVariablePlot(getVersionName("Outdoors", version), samples))
+    StemFlowerPlots.setdefault("Objective Function Value", ContinuousVariablePlot(getVersionName("Objective Function Value", version), samples))
+    StemFlowerPlots.setdefault("Sampled Reward", ContinuousVariablePlot(getVersionName("Sampled Reward", version), samples))
+    StemFlowerPlots.setdefault("Runtime", DiscreteVariablePlot(getVersionName("Total Runtime (s)", version), samples))
+    StemFlowerPlots.setdefault("Optimization Time", DiscreteVariablePlot(getVersionName("Optimization Time (s)", version), samples))
+    StemFlowerPlots.setdefault("Simplex Iterations", DiscreteVariablePlot(getVersionName("Number of Simplex Iterations", version), samples))
+    
+    if nested:
+        generateNestedModels(StemFlowerModels.get(version), StemFlowerPlots, "Model 2", samples, trials, analyticReward)
+        return
+    if scheduler is not None:
+        generateScheduledModels(StemFlowerModels.get(version), StemFlowerPlots, "Model 2", samples, trials, scheduler, analyticReward)
+        return
     
+    records = list()
     for n in samples:
         
         TulipType = list()
@@ -81,15 +222,16 @@ def generateStemFlowerModels(samples, trials):
         i = 0
         while i < trials:
             name = "Model 2 at i = " + str(i) + " and n = " + str(n)
-            sampleModel = StemFlowerModel(name, np.random.randint(10e6), n)
+            sampleModel = StemFlowerModels.get(version)(name, np.random.randint(10e6), n)
             TulipType.append(sampleModel.getVar("Tulip Type"))
             Water.append(sampleModel.getVar("Amount of Water/week (mL)"))
             Outdoor.append(sampleModel.getVar("Outdoor?"))
             Obj.append(sampleModel.getObj())
-            Reward.append(sampleModel.getSampleReward(trials))
+            Reward.append(getReward(sampleModel, trials, analyticReward))
             Runtime.append(sampleModel.getRunTime())
             OptTime.append(sampleModel.getOptimizationTime())
             SimplexIter.append(sampleModel.getSimplexIters())
+            records.append(getRecord(sampleModel, version))
             i += 1
             
         StemFlowerPlots.get("Tulip Type").addAvg(TulipType)
@@ -100,23 +242,32 @@ def generateStemFlowerModels(samples, trials):
         StemFlowerPlots.get("Runtime").addAvg(Runtime)
         StemFlowerPlots.get("Optimization Time").addAvg(OptTime)
         StemFlowerPlots.get("Simplex Iterations").addAvg(SimplexIter)
-        print("Generated " + str(trials) +  " Stem Flower Models for n = " + str(n))
+        print("Generated " + str(trials) +  " " + getVersionName("Stem Flower Models", version) + " for n = " + str(n))
         
+    verifySweep("Model 2", sampleModel, records, getVerifier(StemFlowerModels.get(version), version))
     print("Completed generating all Stem Flower Models.")
 
-def generateStemFlowerRootsModels(samples, trials):
-    
+def generateStemFlowerRootsModels(samples, trials, nested = False, analyticReward = False, scheduler = None, version = 1):
+    checkSweepVersion(version, nested, scheduler)
     StemFlowerRootsPlots.clear()
-    StemFlowerRootsPlots.setdefault("Tulip Type", DiscreteVariablePlot("Tulip Type", samples))
-    StemFlowerRootsPlots.setdefault("Amount of Water", ContinuousVariablePlot("Amount of Water/week (mL)", samples))
-    StemFlowerRootsPlots.setdefault("Outdoor", DiscreteVariablePlot("Outdoors", samples))
-    StemFlowerRootsPlots.setdefault("Pellets", DiscreteVariablePlot("Number of Fertilizer Pellets/week", samples))
-    StemFlowerRootsPlots.setdefault("Objective Function Value", ContinuousVariablePlot("Objective Function Value", samples))
-    StemFlowerRootsPlots.setdefault("Sampled Reward", ContinuousVariablePlot("Sampled Reward", samples))
-    StemFlowerRootsPlots.setdefault("Runtime", DiscreteVariablePlot("Total Runtime (s)", samples))
-    StemFlowerRootsPlots.setdefault("Optimization Time", DiscreteVariablePlot("Optimization Time (s)", samples))
-    StemFlowerRootsPlots.setdefault("Simplex Iterations", DiscreteVariablePlot("Number of Simplex Iterations", samples))
+    StemFlowerRootsPlots.setdefault("Tulip Type", DiscreteVariablePlot(getVersionName("Tulip Type", version), samples))
+    StemFlowerRootsPlots.setdefault("Amount of Water", ContinuousVariablePlot(getVersionName("Amount of Water/week (mL)", version), samples))
+    StemFlowerRootsPlots.setdefault("Outdoor", DiscreteVariablePlot(getVersionName("Outdoors", version), samples))
+    StemFlowerRootsPlots.setdefault("Pellets", DiscreteVariablePlot(getVersionName("Number of Fertilizer Pellets/week", version), samples))
+    StemFlowerRootsPlots.setdefault("Objective Function Value", ContinuousVariablePlot(getVersionName("Objective Function Value", version), samples))
+    StemFlowerRootsPlots.setdefault("Sampled Reward", ContinuousVariablePlot(getVersionName("Sampled Reward", version), samples))
+    StemFlowerRootsPlots.setdefault("Runtime", DiscreteVariablePlot(getVersionName("Total Runtime (s)", version), samples))
+    StemFlowerRootsPlots.setdefault("Optimization Time", DiscreteVariablePlot(getVersionName("Optimization Time (s)", version), samples))
+    StemFlowerRootsPlots.setdefault("Simplex Iterations", DiscreteVariablePlot(getVersionName("Number of Simplex Iterations", version), samples))
+    
+    if nested:
+        generateNestedModels(StemFlowerRootsModels.get(version), StemFlowerRootsPlots, "Model 3", samples, trials, analyticReward)
+        return
+    if scheduler is not None:
+        generateScheduledModels(StemFlowerRootsModels.get(version), StemFlowerRootsPlots, "Model 3", samples, trials, scheduler, analyticReward)
+        return
     
+    records = list()
     for n in samples:
         
         TulipType = list()
@@ -132,16 +283,17 @@ def generateStemFlowerRootsModels(samples, trials):
         i = 0
         while i < trials:
             name = "Model 3 at i = " + str(i) + " and n = " + str(n)
-            sampleModel = StemFlowerRootsModel(name, np.random.randint(10e6), n)
+            sampleModel = StemFlowerRootsModels.get(version)(name, np.random.randint(10e6), n)
             TulipType.append(sampleModel.getVar("Tulip Type"))
             Water.append(sampleModel.getVar("Amount of Water/week (mL)"))
             Outdoor.append(sampleModel.getVar("Outdoor?"))
             Pellets.append(sampleModel.getVar("Number of Fertilizer Pellets"))
             Obj.append(sampleModel.getObj())
-            Reward.append(sampleModel.getSampleReward(trials))
+            Reward.append(getReward(sampleModel, trials, analyticReward))
             Runtime.append(sampleModel.getRunTime())
             OptTime.append(sampleModel.getOptimizationTime())
             SimplexIter.append(sampleModel.getSimplexIters())
+            records.append(getRecord(sampleModel, version))
             i += 1
             
         StemFlowerRootsPlots.get("Tulip Type").addAvg(TulipType)
@@ -153,8 +305,9 @@ def generateStemFlowerRootsModels(samples, trials):
         StemFlowerRootsPlots.get("Runtime").addAvg(Runtime)
         StemFlowerRootsPlots.get("Optimization Time").addAvg(OptTime)
         StemFlowerRootsPlots.get("Simplex Iterations").addAvg(SimplexIter)  
-        print("Generated " + str(trials) +  " Stem Flower Roots Models for n = " + str(n))
+        print("Generated " + str(trials) +  " " + getVersionName("Stem Flower Roots Models", version) + " for n = " + str(n))
         
+    verifySweep("Model 3", sampleModel, records, getVerifier(StemFlowerRootsModels.get(version), version))
     print("Completed generating all Stem Flower Roots Models.")
     
 def plotStemVariable(name, colour):
@@ -0,0 +1,150 @@
+import math
+import numpy as np
+from StemFlowerRootsModelV2 import RedParams, PurpleParams, CostParams
+from NormalFunctions import getNormalCdf
+
+'''
+Multi-week growth MDP for the stem + flower + roots tulip, solved by backward induction:
+    - The tulip type is fixed at week 0; every week the gardener picks water (on a grid, plus the
+      budget-tight amount), outdoor and pellets, subject to water >= 200*pellets and the weekly budget
+      (the StemFlowerRootsModel rows)
+    - State: total leaf area L on a grid. Each week L' = max(0, L + dL) with
+      dL ~ N(lsaavg(a)/H, lsastdev(a)/sqrt(H)), so that H weeks of the same action give the
+      one-shot season distribution N(lsaavg, lsastdev)
+    - Reward each week: the stem grows by 0.1*(L' - L), and the flower and roots by flavg(a)/H and
+      roavg(a)/H. The stem increments add up to the season's 0.1*L_H (L_0 = 0), so stem height only
+      enters the return additively and is accumulated in the reward rather than carried as a second
+      state dimension
+NOTES:
+    - Transitions only depend on L' - L (except at the grid edges), so they are stored banded: one
+      kernel of normal CDF differences per action over the offsets within 6 stdevs of the mean step,
+      with the mass beyond the band lumped into its end offsets. Landing states are clipped to the grid
+    - The floor L' >= 0 is applied every week, so E[L_H] under a fixed action is slightly above the one-shot
+      truncated mean (e.g. 42.11 vs 41.60 for the plan [1, 1, 3, 690] with H = 8); with H = 1 they agree
+    - A Bellman backup gathers the value at each state's band (states x offsets) and contracts it with
+      the kernels, so a week costs (actions x states x offsets) instead of (actions x states x states)
+'''
+
+class GrowthMDP:
+    def __init__(self, horizon = 8, leafStep = 2.5, leafMax = 600, waterStep = 50, budget = 12,
+                 redParams = RedParams, purpleParams = PurpleParams, costParams = CostParams):
+        self.horizon = int(horizon)
+        self.leafGrid = np.arange(0, leafMax + leafStep, leafStep)
+        self.leafStep = leafStep
+        self.budget = budget
+        self.params = {1: redParams, 0: purpleParams}
+        self.costParams = costParams
+        self.buildActions(waterStep)
+
+    # Water grid plus the budget-tight water of each (type, outdoor, pellets), where the one-shot optimum
+    # usually sits (as in GardenSolver and ParametricPolicyTable)
+    def buildActions(self, waterStep):
+        actions = list()
+        for tulipType in [0, 1]:
+            for outdoor in [0, 1]:
+                for pellets in [2, 3, 4, 5]:
+                    fixedCost = (self.costParams.get("Red Tulip" if tulipType == 1 else "Purple Tulip")
+                                 + self.costParams.get("Outdoor")*(1 - outdoor) + self.costParams.get("Pellets")*pellets)
+                    tight = (self.budget - fixedCost)/self.costParams.get("Water")
+                    waters = np.arange(250, 1000 + waterStep, waterStep)
+                    waters = np.unique(np.append(waters[waters < tight], min(tight, 1000)))
+                    for water in waters:
+                        if water >= max(250, 200*pellets):
+                            actions.append((tulipType, outdoor, pellets, water))
+        self.actions = np.array(actions, dtype = float)
+
+    def getOutputs(self, actions):
+        tulipType, outdoor, pellets, water = actions.T
+        outputs = {}
+        for name, keys in [("Leaf Avg", [("Leaf Base Avg", 1), ("Leaf Water Ratio Avg", water),
+                                         ("Leaf Outdoor Ratio Avg", outdoor), ("Leaf Pellets Ratio Avg", pellets)]),
+                           ("Leaf Stdev", [("Leaf Base Stdev", 1), ("Leaf Water Ratio Stdev", water),
+                                           ("Leaf Outdoor Ratio Stdev", outdoor)]),
+                           ("Flower Avg", [("Flower Base Avg", 1), ("Flower Water Ratio Avg", water),
+                                           ("Flower Outdoor Ratio Avg", outdoor)]),
+                           ("Roots Avg", [("Roots Base Avg", 1), ("Roots Pellets Ratio Avg", pellets),
+                                          ("Roots Outdoor Ratio Avg", outdoor)])]:
+            red = sum(self.params[1].get(key)*feature for key, feature in keys)
+            purple = sum(self.params[0].get(key)*feature for key, feature in keys)
+            outputs[name] = np.where(tulipType == 1, red, purple)
+        return outputs
+
+    # Banded transitions: (landing, kernel) with landing[i, d] the grid state reached from state i by
+    # offset d (clipped to the grid) and kernel[a, d] = Pr(offset d | action a)
+    def buildTransitions(self, actions):
+        outputs = self.getOutputs(actions)
+        mean = outputs.get("Leaf Avg")/self.horizon
+        stdev = np.maximum(outputs.get("Leaf Stdev"), 1e-9)/math.sqrt(self.horizon)
+        states = len(self.leafGrid)
+        low = max(int(np.floor(np.min(mean - 6*stdev)/self.leafStep)) - 1, -(states - 1))
+        high = min(int(np.ceil(np.max(mean + 6*stdev)/self.leafStep)) + 1, states - 1)
+        offsets = np.arange(low, high + 1)
+        edges = getNormalCdf(((np.append(offsets, high + 1) - 0.5)*self.leafStep - mean[:, None])/stdev[:, None])
+        kernel = np.diff(edges, axis = 1)
+        # Mass beyond the band goes to its end offsets, so every row sums to 1
+        kernel[:, 0] += edges[:, 0]
+        kernel[:, -1] += 1 - edges[:, -1]
+        landing = np.clip(np.arange(states)[:, None] + offsets[None, :], 0, states - 1)
+        return landing, kernel
+
+    # E[f(L') | L = grid i, action a] for every (a, i)
+    def getExpectation(self, transitions, f):
+        landing, kernel = transitions
+        return kernel @ f[landing].T
+
+    def solve(self):
+        self.policies = {}
+        self.values = {}
+        for tulipType in [0, 1]:
+            actions = self.actions[self.actions[:, 0] == tulipType]
+            transitions = self.buildTransitions(actions)
+            outputs = self.getOutputs(actions)
+            expectedLeaf = self.getExpectation(transitions, self.leafGrid)
+            rewards = (0.1*(expectedLeaf - self.leafGrid[None, :])
+                       + (outputs.get("Flower Avg") + outputs.get("Roots Avg"))[:, None]/self.horizon)
+
+            value = np.zeros(len(self.leafGrid))
+            policy = np.empty((self.horizon, len(self.leafGrid)), dtype = int)
+            values = np.empty((self.horizon + 1, len(self.leafGrid)))
+            values[self.horizon] = value
+            for week in range(self.horizon - 1, -1, -1):
+                q = rewards + self.getExpectation(transitions, value)
+                policy[week] = np.argmax(q, axis = 0)
+                value = q[policy[week], np.arange(len(self.leafGrid))]
+                values[week] = value
+            self.policies[tulipType] = (actions, policy)
+            self.values[tulipType] = values
+
+        # The tulip type is chosen at week 0 from the initial state L = 0
+        self.tulipType = max([0, 1], key = lambda t: self.values[t][0, 0])
+        return self.getPolicyTable()
+
+    # Policy table: week x leaf grid x (tulip type, outdoor, pellets, water)
+    def getPolicyTable(self, tulipType = None):
+        tulipType = self.tulipType if tulipType is None else tulipType
+        actions, policy = self.policies.get(tulipType)
+        return actions[policy]
+
+    def getObj(self):
+        return self.values[self.tulipType][0, 0]
+
+    def getAction(self, week, leaf):
+        state = np.clip(np.rint(np.asarray(leaf)/self.leafStep).astype(int), 0, len(self.leafGrid) - 1)
+        return self.getPolicyTable()[week, state]
+
+    # Vectorised rollouts of any policy(week, leaf array) -> action rows; None uses the DP policy.
+    # A fixed one-shot MILP plan (re-planned every week with no state) is policy = lambda w, L: plan
+    def simulate(self, episodes = 10000, policy = None, randomSeed = None):
+        rng = np.random.default_rng(randomSeed)
+        policy = self.getAction if policy is None else policy
+        leaf = np.zeros(episodes)
+        total = np.zeros(episodes)
+        for week in range(self.horizon):
+            actions = np.broadcast_to(np.asarray(policy(week, leaf), dtype = float), (episodes, 4))
+            outputs = self.getOutputs(actions)
+            growth = rng.normal(outputs.get("Leaf Avg")/self.horizon,
+                                np.maximum(outputs.get("Leaf Stdev"), 0)/math.sqrt(self.horizon))
+            grown = np.clip(leaf + growth, 0, self.leafGrid[-1])
+            total += 0.1*(grown - leaf) + (outputs.get("Flower Avg") + outputs.get("Roots Avg"))/self.horizon
+            leaf = grown
+        return np.mean(total), np.std(total)/math.sqrt(episodes)
@@ -0,0 +1,128 @@
+import os
+import json
+import inspect
+import hashlib
+import threading
+from gurobipy import *
+from AsyncSolve import getThreadEnv
+
+'''
+On-disk cache of the structural V2 models (variables, big-M rows, budget row), so workers and CLI runs
+read a small file instead of rebuilding the model in Python:
+    - The structure hash covers the model class, the source of its whole module (rows and objective terms
+      are also added outside buildModel, e.g. the risk-mode SOC rows in getHeightStdevVar), the
+      red/purple/cost parameter dicts and the objective mode, so editing any of them misses the cache
+      instead of loading a stale model
+    - <hash>.mps.gz holds the model; <hash>.json is the sidecar with the column and row names (MPS
+      replaces names containing spaces)
+    - On a hit only the sample means are drawn and the objective is reset with setSampleObjective (a
+      linear objective over a handful of output variables, so there is nothing to gain by patching
+      coefficients in place); the solver parameters are applied as in buildModel
+NOTES:
+    - Files are written to a temporary name and renamed, so concurrent workers never read a partial model
+    - A template is read from disk once per process and kept in memory; later models are copies of it
+      into the Env of the calling thread (AsyncSolve.getThreadEnv), as buildModel would have created them
+'''
+
+QuietEnv = None
+EnvLock = threading.Lock()
+# Module source per model class (inspect.getsource reads the module file, so it is looked up once)
+Sources = {}
+
+def getQuietEnv():
+    global QuietEnv
+    with EnvLock:
+        if QuietEnv is None:
+            QuietEnv = Env(empty = True)
+            QuietEnv.setParam("OutputFlag", 0)
+            QuietEnv.start()
+    return QuietEnv
+
+class ModelCache:
+    def __init__(self, directory = "model_cache"):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.templates = {}
+        os.makedirs(self.directory, exist_ok = True)
+
+    def getHash(self, model):
+        modelClass = type(model)
+        if modelClass not in Sources:
+            Sources[modelClass] = inspect.getsource(inspect.getmodule(modelClass))
+        structure = {"Class": modelClass.__module__ + "." + modelClass.__name__,
+                     "Source": Sources.get(modelClass),
+                     "Red Params": model.redParams,
+                     "Purple Params": model.purpleParams,
+                     "Cost Params": model.costParams,
+                     "Objective": getattr(model, "objective", "SAA"),
+                     "Risk Param": getattr(model, "riskParam", None)}
+        return hashlib.sha256(json.dumps(structure, sort_keys = True).encode()).hexdigest()[:32]
+
+    def getPaths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".mps.gz", base + ".json"
+
+    def save(self, model, key = None):
+        key = self.getHash(model) if key is None else key
+        modelPath, sidecarPath = self.getPaths(key)
+        model.model.update()
+        sidecar = {"Hash": key,
+                   "Class": type(model).__name__,
+                   "Vars": [v.VarName for v in model.model.getVars()],
+                   "Constrs": [c.ConstrName for c in model.model.getConstrs()],
+                   "QConstrs": [c.QCName for c in model.model.getQConstrs()]}
+
+        suffix = ".%d.%d" % (os.getpid(), threading.get_ident())
+        model.model.write(modelPath + suffix + ".mps.gz")
+        os.replace(modelPath + suffix + ".mps.gz", modelPath)
+        with open(sidecarPath + suffix, "w") as f:
+            json.dump(sidecar, f)
+        os.replace(sidecarPath + suffix, sidecarPath)
+        return key
+
+    def read(self, key):
+        if key in self.templates:
+            model, sidecar = self.templates.get(key)
+            with EnvLock:
+                return model.copy(getThreadEnv()), sidecar
+        modelPath, sidecarPath = self.getPaths(key)
+        if not (os.path.exists(modelPath) and os.path.exists(sidecarPath)):
+            return None, None
+        with open(sidecarPath) as f:
+            sidecar = json.load(f)
+        model = read(modelPath, getQuietEnv())
+        model.setAttr("VarName", model.getVars(), sidecar.get("Vars"))
+        model.setAttr("ConstrName", model.getConstrs(), sidecar.get("Constrs"))
+        if sidecar.get("QConstrs"):
+            model.setAttr("QCName", model.getQConstrs(), sidecar.get("QConstrs"))
+        model.update()
+        self.templates[key] = (model, sidecar)
+        with EnvLock:
+            return model.copy(getThreadEnv()), sidecar
+
+    # A V2 model built from the cache when possible (built and cached otherwise), solved unless lazy
+    def getModel(self, modelClass, name, randomSeed, n, lazy = False, **kwargs):
+        sampleModel = modelClass(name, randomSeed, n, lazy = True, **kwargs)
+        key = self.getHash(sampleModel)
+        cached, sidecar = self.read(key)
+        if cached is None:
+            self.misses += 1
+            sampleModel.buildModel()
+            self.save(sampleModel, key)
+        else:
+            self.hits += 1
+            cached.ModelName = name
+            cached.setParam("OutputFlag", 0)
+            for param in sampleModel.solverParams:
+                cached.setParam(param, sampleModel.solverParams.get(param))
+            sampleModel.model = cached
+            sampleModel.drawSamples()
+            sampleModel.setSampleObjective()
+            sampleModel.built = True
+        if not lazy:
+            sampleModel.solve()
+        return sampleModel
+
+    def getHitRate(self):
+        return self.hits/max(self.hits + self.misses, 1)
@@ -0,0 +1,57 @@
+import numpy as np
+
+'''
+Prefix-consistent sample streams for sweeps over n:
+    - Each named stream has its own generator (seeded from the sweep seed and the stream name),
+      so the first n samples of a stream never change when it is extended to a larger n
+    - Running sums are kept per stream so the sample mean at the current length costs O(1)
+'''
+
+class NestedSampleStream:
+    def __init__(self, randomSeed):
+        self.randomSeed = randomSeed
+        self.generators = {}
+        self.distributions = {}
+        self.samples = {}
+        self.sums = {}
+        self.drawn = 0
+
+    def getGenerator(self, name, distribution):
+        if name not in self.generators:
+            seed = np.random.SeedSequence(self.randomSeed, spawn_key = tuple(name.encode()))
+            self.generators[name] = np.random.default_rng(seed)
+            self.distributions[name] = distribution
+            self.samples[name] = np.empty(0)
+            self.sums[name] = 0.0
+        return self.generators.get(name)
+
+    def draw(self, generator, distribution, size):
+        if distribution == "normal":
+            return generator.standard_normal(size)
+        elif distribution == "exponential":
+            return generator.standard_exponential(size)
+        elif distribution == "uniform":
+            return generator.random(size)
+        raise ValueError("Unknown distribution: " + str(distribution))
+
+    def extend(self, name, n, distribution = "normal"):
+        generator = self.getGenerator(name, distribution)
+        cur = len(self.samples.get(name))
+        if n > cur:
+            new = self.draw(generator, self.distributions.get(name), int(n) - cur)
+            self.samples[name] = np.concatenate((self.samples.get(name), new))
+            self.sums[name] += np.sum(new)
+            self.drawn += len(new)
+        return self.samples.get(name)[:int(n)]
+
+    def getSamples(self, name, n, distribution = "normal"):
+        return self.extend(name, n, distribution)
+
+    def getMean(self, name, n, distribution = "normal"):
+        samples = self.extend(name, n, distribution)
+        if len(self.samples.get(name)) == int(n):
+            return self.sums.get(name)/int(n)
+        return np.mean(samples)
+
+    def getDrawn(self):
+        return self.drawn
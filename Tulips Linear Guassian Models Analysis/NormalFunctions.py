@@ -0,0 +1,31 @@
+import math
+import numpy as np
+
+'''
+Vectorised standard normal functions for whole arrays (transition kernels, importance weights), without
+a per-element Python loop:
+    - getErfc is the Chebyshev-fitted rational approximation of erfc (Numerical Recipes, erfcc), with a
+      fractional error below 1.2e-7 everywhere, so far tail probabilities keep their relative accuracy
+    - getNormalCdf(x) = erfc(-x/sqrt(2))/2, which is accurate in the lower tail (no 1 - 1 cancellation)
+NOTES:
+    - For scalars statistics.NormalDist is exact to double precision and is used elsewhere in the repo
+'''
+
+ErfcCoefficients = [0.17087277, -0.82215223, 1.48851587, -1.13520398, 0.27886807,
+                    -0.18628806, 0.09678418, 0.37409196, 1.00002368, -1.26551223]
+
+def getErfc(x):
+    x = np.asarray(x, dtype = float)
+    z = np.abs(x)
+    t = 1/(1 + 0.5*z)
+    poly = np.zeros_like(t)
+    for coefficient in ErfcCoefficients:
+        poly = coefficient + t*poly
+    tail = t*np.exp(-z*z + poly)
+    return np.where(x >= 0, tail, 2 - tail)
+
+def getNormalCdf(x):
+    return 0.5*getErfc(-np.asarray(x, dtype = float)/math.sqrt(2))
+
+def getNormalPdf(x):
+    return np.exp(-0.5*np.asarray(x)**2)/math.sqrt(2*math.pi)
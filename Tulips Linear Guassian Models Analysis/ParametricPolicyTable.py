@@ -0,0 +1,244 @@
+import os
+import json
+import itertools
+import numpy as np
+from StemFlowerRootsModelV2 import RedParams, PurpleParams, CostParams
+
+'''
+Offline/online split for repeated StemFlowerRootsModel queries that only change the budget (the
+"<= 12" RHS) or the Water, Pellets and Outdoor costs:
+    - Parameters theta = (Budget, Water Cost, Pellets Cost, Outdoor Cost) live in a box, which is split
+      into a kd-tree of cells. A cell is a region when the optimal (type, outdoor, pellets) and the water
+      regime (lower bound, 1000, or budget-tight) agree at its 16 corners and centre
+    - In a region, water is affine in the lifted parameters phi = (1, B/wc, pc/wc, oc/wc, 1/wc):
+      the lower bound or 1000 (constant), or budget-tight water = (B - type cost - oc*(1 - outdoor) - pc*pellets)/wc
+    - Online: point location (at most maxDepth comparisons) plus one affine evaluation, no solver.
+      Cells still mixed at maxDepth, and points outside the box, are answered by the closed-form
+      enumeration below
+NOTES:
+    - For a fixed (type, outdoor, pellets) the objective is linear in water and the only water rows are
+      its bounds, water >= 200*pellets and the budget, so the optimum is at a water bound; enumerating
+      the 16 discrete choices gives the exact optimum and is used to label corners
+    - The objective is the SAA objective with fixed sample means (all zero gives the expected reward,
+      ignoring the truncation of the leaf area at 0)
+    - Corner agreement does not prove the whole cell agrees; getAgreement measures it on random points
+'''
+
+ParamNames = ["Budget", "Water", "Pellets", "Outdoor"]
+
+def getDiscreteChoices():
+    return np.array(list(itertools.product([0, 1], [0, 1], [2, 3, 4, 5])), dtype = float)
+
+class ParametricPolicyTable:
+    def __init__(self, bounds = None, sampleMeans = None, maxDepth = 16,
+                 redParams = RedParams, purpleParams = PurpleParams, costParams = CostParams):
+        # bounds[i] = (low, high) for ParamNames[i]; the water cost must stay positive
+        self.bounds = np.array(bounds if bounds is not None else [(6, 20), (0.005, 0.03), (0, 0.5), (0, 5)], dtype = float)
+        self.sampleMeans = {"Leaf": 0.0, "Stem": 0.0, "Flower": 0.0, "Roots": 0.0}
+        self.sampleMeans.update({} if sampleMeans is None else sampleMeans)
+        self.maxDepth = maxDepth
+        self.redParams = redParams
+        self.purpleParams = purpleParams
+        self.costParams = costParams
+        self.choices = getDiscreteChoices()
+        self.buildObjective()
+
+    # Objective of every discrete choice as intercept + slope*water
+    def buildObjective(self):
+        tulipType, outdoor, pellets = self.choices.T
+        values = list()
+        for water in [0.0, 1.0]:
+            value = np.zeros(len(self.choices))
+            for params, selected in [(self.redParams, tulipType == 1), (self.purpleParams, tulipType == 0)]:
+                def output(component, statistic):
+                    return (params.get(component + " Base " + statistic, 0.0)
+                            + params.get(component + " Water Ratio " + statistic, 0.0)*water
+                            + params.get(component + " Outdoor Ratio " + statistic, 0.0)*outdoor
+                            + params.get(component + " Pellets Ratio " + statistic, 0.0)*pellets)
+                leaf = output("Leaf", "Avg") + output("Leaf", "Stdev")*self.sampleMeans.get("Leaf")
+                reward = (leaf*(0.1 + 0.05*self.sampleMeans.get("Stem"))
+                          + output("Flower", "Avg") + output("Flower", "Stdev")*self.sampleMeans.get("Flower")
+                          + output("Roots", "Avg") + output("Roots", "Stdev")*self.sampleMeans.get("Roots"))
+                value = np.where(selected, reward, value)
+            values.append(value)
+        self.intercepts = values[0]
+        self.slopes = values[1] - values[0]
+        self.typeCosts = np.where(tulipType == 1, self.costParams.get("Red Tulip"), self.costParams.get("Purple Tulip"))
+        self.waterLower = np.maximum(250, 200*pellets)
+
+    # Exact optimum for a batch of parameter points: (label, water, value); label = choice*3 + regime, -1 if infeasible
+    def enumerate(self, points):
+        points = np.atleast_2d(np.asarray(points, dtype = float))
+        budget, waterCost, pelletsCost, outdoorCost = [points[:, [i]] for i in range(4)]
+        outdoor, pellets = self.choices[:, 1], self.choices[:, 2]
+        cap = (budget - self.typeCosts - outdoorCost*(1 - outdoor) - pelletsCost*pellets)/waterCost
+        upper = np.minimum(1000, cap)
+        feasible = upper >= self.waterLower - 1e-9
+        increasing = self.slopes > 0
+        water = np.where(increasing, upper, self.waterLower)
+        regime = np.where(increasing, np.where(cap >= 1000, 1, 2), 0)
+        values = np.where(feasible, self.intercepts + self.slopes*water, -np.inf)
+        best = np.argmax(values, axis = 1)
+        rows = np.arange(len(points))
+        label = np.where(np.isfinite(values[rows, best]), 3*best + regime[rows, best], -1)
+        return label, water[rows, best], values[rows, best]
+
+    def build(self):
+        corners = np.array(list(itertools.product([0, 1], repeat = 4)), dtype = float)
+        lower = [self.bounds[:, 0]]
+        upper = [self.bounds[:, 1]]
+        labels = [0]
+        splitDims = [-1]
+        children = [-1]
+        frontier = [0]
+        depth = 0
+        while frontier:
+            # Corners and centre of every frontier cell, labelled in one batch
+            lo = np.array([lower[node] for node in frontier])
+            hi = np.array([upper[node] for node in frontier])
+            points = lo[:, None, :] + (hi - lo)[:, None, :]*np.vstack([corners, [[0.5]*4]])[None, :, :]
+            label, _, _ = self.enumerate(points.reshape(-1, 4))
+            label = label.reshape(len(frontier), -1)
+
+            nextFrontier = list()
+            for cell, node in enumerate(frontier):
+                cornerLabels = label[cell, :16]
+                if np.all(label[cell] == label[cell, 0]):
+                    labels[node] = label[cell, 0]
+                    continue
+                if depth >= self.maxDepth:
+                    labels[node] = -2
+                    continue
+                # Split the dimension with the most corner edges whose labels disagree
+                disagreements = [np.sum(cornerLabels[corners[:, d] == 0] != cornerLabels[corners[:, d] == 1]) for d in range(4)]
+                dim = int(np.argmax(disagreements))
+                mid = 0.5*(lower[node][dim] + upper[node][dim])
+                splitDims[node] = dim
+                children[node] = len(labels)
+                for half in [0, 1]:
+                    childLower = lower[node].copy()
+                    childUpper = upper[node].copy()
+                    if half == 0:
+                        childUpper[dim] = mid
+                    else:
+                        childLower[dim] = mid
+                    lower.append(childLower)
+                    upper.append(childUpper)
+                    labels.append(0)
+                    splitDims.append(-1)
+                    children.append(-1)
+                    nextFrontier.append(len(labels) - 1)
+            frontier = nextFrontier
+            depth += 1
+
+        self.lower = np.array(lower)
+        self.upper = np.array(upper)
+        self.labels = np.array(labels, dtype = int)
+        self.splitDims = np.array(splitDims, dtype = int)
+        self.children = np.array(children, dtype = int)
+        return self
+
+    # Leaf node of every point (vectorised point location)
+    def locate(self, points):
+        nodes = np.zeros(len(points), dtype = int)
+        active = self.splitDims[nodes] >= 0
+        while np.any(active):
+            index = np.nonzero(active)[0]
+            node = nodes[index]
+            dim = self.splitDims[node]
+            mid = 0.5*(self.lower[node, dim] + self.upper[node, dim])
+            nodes[index] = self.children[node] + (points[index, dim] >= mid)
+            active[index] = self.splitDims[nodes[index]] >= 0
+        return nodes
+
+    # Plans for a batch of points: columns (Tulip Type, Outdoor?, Pellets, Water), NaN rows when infeasible
+    def lookupMany(self, points):
+        points = np.atleast_2d(np.asarray(points, dtype = float))
+        if np.any(points[:, 1] <= 0):
+            raise ValueError("The water cost must be positive")
+        labels = self.labels[self.locate(points)]
+        # Points outside the table's box are not covered by any cell, so they are enumerated like mixed cells
+        outside = np.any((points < self.bounds[:, 0]) | (points > self.bounds[:, 1]), axis = 1)
+        exact = (labels == -2) | outside
+        if np.any(exact):
+            labels[exact] = self.enumerate(points[exact])[0]
+
+        plans = np.full((len(points), 4), np.nan)
+        feasible = labels >= 0
+        choice, regime = np.divmod(labels[feasible], 3)
+        budget, waterCost, pelletsCost, outdoorCost = points[feasible].T
+        phi = np.stack([np.ones(len(budget)), budget/waterCost, pelletsCost/waterCost, outdoorCost/waterCost, 1/waterCost], axis = 1)
+        # Lifted affine water map of each region: water = coefficients . phi
+        coefficients = np.zeros((len(choice), 5))
+        coefficients[regime == 0, 0] = self.waterLower[choice[regime == 0]]
+        coefficients[regime == 1, 0] = 1000.0
+        tight = regime == 2
+        coefficients[tight, 1] = 1
+        coefficients[tight, 2] = -self.choices[choice[tight], 2]
+        coefficients[tight, 3] = -(1 - self.choices[choice[tight], 1])
+        coefficients[tight, 4] = -self.typeCosts[choice[tight]]
+        plans[feasible, :3] = self.choices[choice]
+        plans[feasible, 3] = np.sum(coefficients*phi, axis = 1)
+        return plans
+
+    def lookup(self, budget = 12, waterCost = None, pelletsCost = None, outdoorCost = None):
+        point = [budget,
+                 self.costParams.get("Water") if waterCost is None else waterCost,
+                 self.costParams.get("Pellets") if pelletsCost is None else pelletsCost,
+                 self.costParams.get("Outdoor") if outdoorCost is None else outdoorCost]
+        plan = self.lookupMany([point])[0]
+        if np.isnan(plan[0]):
+            return None
+        return {"Tulip Type": float(plan[0]),
+                "Outdoor?": float(plan[1]),
+                "Number of Fertilizer Pellets": float(plan[2]),
+                "Amount of Water/week (mL)": float(plan[3])}
+
+    def getValue(self, plans):
+        choice = np.array([np.nonzero(np.all(self.choices == plan[:3], axis = 1))[0][0] for plan in plans])
+        return self.intercepts[choice] + self.slopes[choice]*plans[:, 3]
+
+    # Fraction of random points where the table lookup matches the exact enumeration
+    def getAgreement(self, n = 10000, randomSeed = None, tol = 1e-6):
+        rng = np.random.default_rng(randomSeed)
+        points = self.bounds[:, 0] + (self.bounds[:, 1] - self.bounds[:, 0])*rng.random((int(n), 4))
+        plans = self.lookupMany(points)
+        _, _, values = self.enumerate(points)
+        feasible = ~np.isnan(plans[:, 0])
+        agree = np.isinf(values) & ~feasible
+        agree[feasible] = np.abs(self.getValue(plans[feasible]) - values[feasible]) <= tol*np.maximum(1.0, np.abs(values[feasible]))
+        return np.mean(agree)
+
+    def getRegions(self):
+        return int(np.sum((self.splitDims < 0) & (self.labels != -2)))
+
+    def getMixedVolume(self):
+        leaves = (self.splitDims < 0) & (self.labels == -2)
+        volume = np.prod(self.upper[leaves] - self.lower[leaves], axis = 1)
+        return np.sum(volume)/np.prod(self.bounds[:, 1] - self.bounds[:, 0])
+
+    # np.savez_compressed appends .npz to a path without it, so save and load both normalise the suffix
+    @staticmethod
+    def getPath(path):
+        path = os.fspath(path)
+        return path if path.endswith(".npz") else path + ".npz"
+
+    def save(self, path):
+        path = self.getPath(path)
+        settings = {"Bounds": self.bounds.tolist(), "Sample Means": self.sampleMeans, "Max Depth": self.maxDepth,
+                    "Red Params": self.redParams, "Purple Params": self.purpleParams, "Cost Params": self.costParams}
+        np.savez_compressed(path, lower = self.lower, upper = self.upper, labels = self.labels,
+                            splitDims = self.splitDims, children = self.children, settings = json.dumps(settings))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(cls.getPath(path))
+        settings = json.loads(str(data["settings"]))
+        table = cls(settings.get("Bounds"), settings.get("Sample Means"), settings.get("Max Depth"),
+                    settings.get("Red Params"), settings.get("Purple Params"), settings.get("Cost Params"))
+        table.lower = data["lower"]
+        table.upper = data["upper"]
+        table.labels = data["labels"]
+        table.splitDims = data["splitDims"]
+        table.children = data["children"]
+        return table
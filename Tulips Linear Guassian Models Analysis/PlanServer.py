@@ -0,0 +1,278 @@
+import sys
+import json
+import math
+import time
+import queue
+import threading
+import collections
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import StemModelV2
+import StemFlowerModelV2
+import StemFlowerRootsModelV2
+from RiskObjectives import checkObjectiveMode
+
+'''
+Long-running local plan server, so other services do not pay the gurobipy import and licence check
+(and the model build) on every plan:
+    - POST /plan with {"model": "Stem" | "StemFlower" | "StemFlowerRoots", "seed": s, "n": n,
+      "objective": ..., "riskParam": ...} returns the solution record of that model (see getSolutionRecord)
+    - GET /stats returns latency percentiles (queue wait + solve), queue depth and batch sizes
+    - One model per (model, objective, riskParam) is built once and kept as a template; a request only
+      redraws the sample means, resets the objective and re-optimizes from the previous optimum
+    - A batcher thread coalesces the requests that arrive within batchWindow seconds (up to maxBatch):
+      identical requests are solved once, and the rest are grouped by template and solved back to back
+    - Requests are validated in submit (bad fields, n above maxSamples and a non-SAA objective for the
+      roots model are a 400), a failed solve only fails the requests of its group, and a request that
+      is not answered within requestTimeout seconds is a 504
+NOTES:
+    - Localhost HTTP only (stdlib http.server); run with python PlanServer.py [port]
+    - At most maxTemplates templates are kept; the least recently used one is dropped (and rebuilt on demand)
+    - PlanClient and runLoad are the stand-in client and load generator for throughput tests
+'''
+
+ModelClasses = {"Stem": StemModelV2.StemModel,
+                "StemFlower": StemFlowerModelV2.StemFlowerModel,
+                "StemFlowerRoots": StemFlowerRootsModelV2.StemFlowerRootsModel}
+
+class PlanServer:
+    def __init__(self, port = 8642, batchWindow = 0.005, maxBatch = 64, history = 10000, maxTemplates = 32,
+                 requestTimeout = 60, maxSamples = 1 << 20):
+        self.port = port
+        self.batchWindow = batchWindow
+        self.maxBatch = maxBatch
+        self.maxTemplates = maxTemplates
+        self.requestTimeout = requestTimeout
+        self.maxSamples = maxSamples
+        self.requests = queue.Queue()
+        self.templates = collections.OrderedDict()
+        self.latencies = collections.deque(maxlen = history)
+        self.batchSizes = collections.deque(maxlen = history)
+        self.served = 0
+        self.lock = threading.Lock()
+        self.running = False
+        for name in ModelClasses:
+            self.getTemplate(name, "SAA", None)
+
+    # (model, objective, riskParam) as hashable scalars; raises ValueError on a malformed request
+    def getKey(self, request):
+        name = request.get("model", "StemFlowerRoots")
+        if not isinstance(name, str) or name not in ModelClasses:
+            raise ValueError("Unknown model: " + str(name))
+        objective = request.get("objective", "SAA")
+        riskParam = request.get("riskParam")
+        if not isinstance(objective, str):
+            raise ValueError("Unknown objective mode: " + str(objective))
+        # The roots model only has the SAA objective; anything else must not be answered with an SAA plan
+        if name == "StemFlowerRoots":
+            if objective != "SAA" or riskParam is not None:
+                raise ValueError("The StemFlowerRoots model only supports the SAA objective")
+            return (name, "SAA", None)
+        if objective in ["SAA", "Expected"]:
+            riskParam = None
+        elif riskParam is not None:
+            if isinstance(riskParam, bool) or not isinstance(riskParam, (int, float)) or not math.isfinite(riskParam):
+                raise ValueError("riskParam must be a number: " + str(riskParam))
+            riskParam = float(riskParam)
+        checkObjectiveMode(objective, riskParam)
+        return (name, objective, riskParam)
+
+    def getInt(self, request, field, default, lower, upper = None):
+        value = request.get(field, default)
+        if (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+                or value != int(value) or value < lower):
+            raise ValueError("%s must be an integer >= %d: %s" % (field, lower, str(value)))
+        if upper is not None and value > upper:
+            raise ValueError("%s must be at most %d: %s" % (field, upper, str(value)))
+        return int(value)
+
+    def getTemplate(self, name, objective, riskParam):
+        key = (name, objective, riskParam)
+        if key not in self.templates:
+            if name == "StemFlowerRoots":
+                template = ModelClasses.get(name)(name, 0, 1)
+            else:
+                template = ModelClasses.get(name)(name, 0, 1, objective = objective, riskParam = riskParam)
+            self.templates[key] = template
+            while len(self.templates) > self.maxTemplates:
+                self.templates.popitem(last = False)
+        self.templates.move_to_end(key)
+        return self.templates.get(key)
+
+    # Thread-safe entry point: returns a Future for the solution record
+    def submit(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("A plan request must be a JSON object")
+        key = self.getKey(request)
+        seed = self.getInt(request, "seed", 0, 0)
+        n = self.getInt(request, "n", 1, 1, self.maxSamples)
+        future = Future()
+        self.requests.put((time.time(), key, seed, n, future))
+        return future
+
+    def solve(self, template, seed, n):
+        for v in template.model.getVars():
+            v.Start = v.x
+        template.randomSeed = seed
+        template.n = n
+        template.drawSamples()
+        template.setSampleObjective()
+        template.model.optimize()
+        return template.getSolutionRecord()
+
+    def runBatcher(self):
+        while self.running:
+            try:
+                batch = [self.requests.get(timeout = 0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.time() + self.batchWindow
+            while len(batch) < self.maxBatch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout = remaining))
+                except queue.Empty:
+                    break
+            # The batcher must survive anything a batch throws, or every later request would wait forever
+            try:
+                self.solveBatch(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request[4].done():
+                        request[4].set_exception(e)
+
+    def solveBatch(self, batch):
+        groups = collections.defaultdict(list)
+        for request in batch:
+            try:
+                groups[(request[1], request[2], request[3])].append(request)
+            except Exception as e:
+                request[4].set_exception(e)
+        # Same template back to back, so each solve warm starts from a neighbouring optimum
+        for (key, seed, n) in sorted(groups, key = lambda group: (str(group[0]), group[1], group[2])):
+            try:
+                record = self.solve(self.getTemplate(*key), seed, n)
+                error = None
+            except Exception as e:
+                error = e
+            finished = time.time()
+            for arrival, _, _, _, future in groups.get((key, seed, n)):
+                if error is None:
+                    future.set_result(dict(record))
+                else:
+                    future.set_exception(error)
+                with self.lock:
+                    self.latencies.append(finished - arrival)
+                    self.served += 1
+        with self.lock:
+            self.batchSizes.append(len(batch))
+
+    def getStats(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            batchSizes = np.array(self.batchSizes)
+            stats = {"Served": self.served, "Queue Depth": self.requests.qsize(), "Templates": len(self.templates)}
+        if len(latencies) > 0:
+            for percentile in [50, 90, 99]:
+                stats["Latency p%d (ms)" % percentile] = 1000*float(np.percentile(latencies, percentile))
+            stats["Mean Batch Size"] = float(np.mean(batchSizes))
+        return stats
+
+    def start(self):
+        self.running = True
+        self.batcher = threading.Thread(target = self.runBatcher, daemon = True)
+        self.batcher.start()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self.reply(200, server.getStats())
+                else:
+                    self.reply(404, {"Error": "Unknown path " + self.path})
+
+            def do_POST(self):
+                if self.path != "/plan":
+                    self.reply(404, {"Error": "Unknown path " + self.path})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    future = server.submit(request)
+                except Exception as e:
+                    self.reply(400, {"Error": str(e)})
+                    return
+                try:
+                    self.reply(200, future.result(timeout = server.requestTimeout))
+                except TimeoutError:
+                    self.reply(504, {"Error": "No plan within %g s" % server.requestTimeout})
+                except ValueError as e:
+                    self.reply(400, {"Error": str(e)})
+                except Exception as e:
+                    self.reply(500, {"Error": str(e)})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class PlanClient:
+    def __init__(self, host = "127.0.0.1", port = 8642, timeout = 30):
+        self.url = "http://%s:%d" % (host, port)
+        self.timeout = timeout
+
+    def getPlan(self, model = "StemFlowerRoots", seed = 0, n = 1, **kwargs):
+        request = dict(kwargs, model = model, seed = seed, n = n)
+        data = urllib.request.Request(self.url + "/plan", data = json.dumps(request).encode(),
+                                      headers = {"Content-Type": "application/json"})
+        with urllib.request.urlopen(data, timeout = self.timeout) as response:
+            return json.loads(response.read())
+
+    def getStats(self):
+        with urllib.request.urlopen(self.url + "/stats", timeout = self.timeout) as response:
+            return json.loads(response.read())
+
+# Load generator: requests plans from concurrency client threads, returns throughput and client-side latency percentiles
+def runLoad(client, requests = 1000, concurrency = 16, models = ("Stem", "StemFlower", "StemFlowerRoots"), n = 100, randomSeed = 0):
+    rng = np.random.default_rng(randomSeed)
+    plans = [(models[rng.integers(len(models))], int(rng.integers(1000))) for i in range(requests)]
+
+    def request(plan):
+        start_time = time.time()
+        client.getPlan(plan[0], plan[1], n)
+        return time.time() - start_time
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers = concurrency) as pool:
+        latencies = np.array(list(pool.map(request, plans)))
+    wallTime = time.time() - start_time
+    return {"Requests/Second": requests/wallTime,
+            "Latency p50 (ms)": 1000*float(np.percentile(latencies, 50)),
+            "Latency p90 (ms)": 1000*float(np.percentile(latencies, 90)),
+            "Latency p99 (ms)": 1000*float(np.percentile(latencies, 99))}
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8642
+    PlanServer(port).start()
+    print("Serving tulip plans on http://127.0.0.1:%d" % port)
+    threading.Event().wait()
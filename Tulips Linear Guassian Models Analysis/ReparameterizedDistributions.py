@@ -0,0 +1,139 @@
+from gurobipy import *
+from abc import ABC, abstractmethod
+import numpy as np
+
+'''
+Reparameterised distributions for building SAA objectives:
+    X = loc + scale*eps, eps drawn from a fixed base distribution
+    - loc and scale can be numbers, Gurobi variables or linear expressions
+    - The sample average (1/n)*sum(loc + scale*eps_i) collapses to loc + scale*mean(eps), so the
+      objective has one term per distribution instead of n, and mean(eps) is computed in NumPy
+    - Choice compiles a decision between fixed distributions (e.g. the dice in UNIF-MILP) as
+      sum(sample mean of option k * selector k), which is exact for binary selectors
+'''
+
+# Base class: a distribution only has to define sampleNoise(n), n draws of eps
+class Reparameterized(ABC):
+    def __init__(self, randomSeed = None):
+        self.rng = np.random.default_rng(randomSeed)
+        self.noiseMean = None
+
+    @abstractmethod
+    def sampleNoise(self, n):
+        pass
+
+    def getNoiseMean(self, n):
+        self.noiseMean = float(np.mean(self.sampleNoise(int(n))))
+        return self.noiseMean
+
+    def sample(self, loc, scale, n):
+        return loc + scale*self.sampleNoise(int(n))
+
+    def getObjective(self, loc, scale, n):
+        return loc + scale*self.getNoiseMean(n)
+
+class Normal(Reparameterized):
+    def sampleNoise(self, n):
+        return self.rng.standard_normal(n)
+
+class Exponential(Reparameterized):
+    def sampleNoise(self, n):
+        return self.rng.standard_exponential(n)
+
+# loc is the lower bound and scale the width of the interval
+class Uniform(Reparameterized):
+    def sampleNoise(self, n):
+        return self.rng.random(n)
+
+# eps is uniform on {0, 1, ..., outcomes - 1}, so a fair die is DiscreteUniform(6) with loc = 1, scale = 1
+class DiscreteUniform(Reparameterized):
+    def __init__(self, outcomes, randomSeed = None):
+        Reparameterized.__init__(self, randomSeed)
+        self.outcomes = int(outcomes)
+
+    def sampleNoise(self, n):
+        return self.rng.integers(0, self.outcomes, n)
+
+# eps = exp(sigma*Z), so X = loc + scale*LogNormal(0, sigma)
+class LogNormal(Reparameterized):
+    def __init__(self, sigma, randomSeed = None):
+        Reparameterized.__init__(self, randomSeed)
+        self.sigma = sigma
+
+    def sampleNoise(self, n):
+        return np.exp(self.sigma*self.rng.standard_normal(n))
+
+# eps is drawn from component k with probability weights[k], each component shifted and scaled by
+# its own (loc, scale) before the shared loc + scale*eps is applied
+class Mixture(Reparameterized):
+    def __init__(self, components, weights, randomSeed = None):
+        Reparameterized.__init__(self, randomSeed)
+        self.components = components
+        self.weights = np.asarray(weights, dtype = float)/np.sum(weights)
+
+    def sampleNoise(self, n):
+        picks = self.rng.choice(len(self.components), size = n, p = self.weights)
+        noise = np.empty(n)
+        for k, (component, loc, scale) in enumerate(self.components):
+            chosen = picks == k
+            noise[chosen] = component.sample(loc, scale, np.count_nonzero(chosen))
+        return noise
+
+class Choice:
+    def __init__(self, options):
+        self.options = options
+        self.means = None
+
+    # options is a list of (distribution, loc, scale) with numeric loc and scale, selectors the
+    # matching binary variables or expressions (summing to 1)
+    def getObjective(self, selectors, n):
+        self.means = [distribution.getObjective(loc, scale, n) for distribution, loc, scale in self.options]
+        return quicksum(mean*selector for mean, selector in zip(self.means, selectors))
+
+def getSampleObjective(terms, n):
+    return quicksum(distribution.getObjective(loc, scale, n) for distribution, loc, scale in terms)
+
+
+# UNIF-MILP dice game compiled to one term per die
+def buildDiceModel(n, randomSeed = None):
+    model = Model("UNIF-MILP")
+    model.setParam('OutputFlag', 0)
+    allDice = [((1, 6), (-3, 9)), ((-4, 7), (-2, 4)), ((-2, 5), (-1, 3))]
+    obj = LinExpr()
+    i = 0
+    for dice in allDice:
+        d = model.addVar(vtype = GRB.BINARY, name = "Die " + str(i + 1) + " Decision")
+        unif = Uniform(None if randomSeed is None else randomSeed + i)
+        # The same draws are shared by both options, as in reparameterizeDice
+        loc = dice[0][0]*d + dice[1][0]*(1 - d)
+        scale = (dice[0][1] - dice[0][0])*d + (dice[1][1] - dice[1][0])*(1 - d)
+        obj += unif.getObjective(loc, scale, n)
+        i += 1
+    model.update()
+    model.setObjective(obj, GRB.MAXIMIZE)
+    model.addConstr(quicksum(model.getVars()) <= 2)
+    return model
+
+# EXP-MILP spelling model compiled to one normal and one exponential term
+def buildSpellingModel(n, randomSeed = None):
+    model = Model("EXP-MILP")
+    model.setParam('OutputFlag', 0)
+    scale = model.addVar(lb = -1*GRB.INFINITY, ub = GRB.INFINITY, name = "Scale")
+    p = model.addVar(lb = 0, ub = 10, vtype = GRB.INTEGER, name = "p")
+    s = model.addVar(lb = 0, ub = 10, vtype = GRB.INTEGER, name = "s")
+    b = model.addVar(vtype = GRB.BINARY, name = "b")
+    model.update()
+
+    seed = None if randomSeed is None else randomSeed + 1
+    model.setObjective(getSampleObjective([(Normal(randomSeed), p, -100*p),
+                                           (Exponential(seed), 0, scale)], n), GRB.MAXIMIZE)
+
+    M = 1000
+    model.addConstr(s <= 5 + M*(1 - b))
+    model.addConstr(p <= 3 + M*(1 - b))
+    model.addConstr(scale >= 2*s + p - M*(1 - b))
+    model.addConstr(scale <= 2*s + p + M*(1 - b))
+    model.addConstr(s >= 6 - M*b)
+    model.addConstr(scale >= (1/2)*s - p - M*b)
+    model.addConstr(scale <= (1/2)*s - p + M*b)
+    return model
@@ -0,0 +1,88 @@
+from statistics import NormalDist
+import numpy as np
+
+'''
+Closed-form evaluation of the reward that getSampleReward estimates by Monte Carlo:
+    leafSA     ~ Normal(lsaavg, lsastdev) truncated to leafSA >= 0
+    stemHeight ~ Normal(0.1*leafSA, stemRatio*leafSA)
+    flHeight   ~ Normal(flavg, flstdev)
+    roLength   ~ Normal(roavg, rostdev)
+    reward     = stemHeight (+ flHeight) (+ roLength)
+NOTES:
+    - E[stem] = 0.1*E[L] and Var(stem) = stemRatio^2*E[L^2] + 0.01*Var(L), with the truncated normal
+      moments of L; the other components are independent Gaussians
+    - The stem model has no leaf chain, its reward is Normal(avg, stdev)
+    - stemRatio is 0.05 in the stem + flower model and 0.01 in the stem + flower + roots model
+'''
+
+def getTruncatedNormalMoments(mu, sigma, lower = 0.0):
+    if sigma <= 0:
+        value = max(mu, lower)
+        return value, 0.0
+    alpha = (lower - mu)/sigma
+    tail = 1 - NormalDist().cdf(alpha)
+    if tail <= 0:
+        return lower, 0.0
+    ratio = NormalDist().pdf(alpha)/tail
+    mean = mu + sigma*ratio
+    variance = sigma**2*(1 + alpha*ratio - ratio**2)
+    return mean, max(variance, 0.0)
+
+class RewardEvaluator:
+    def __init__(self, model):
+        varNames = [v.varName for v in model.model.getVars()]
+        self.values = dict((v.varName, v.x) for v in model.model.getVars())
+        self.hasLeaf = "Total Leaf Surface Area Average" in varNames
+        self.hasFlower = "Flower Petal Height Average" in varNames
+        self.hasRoots = "Roots Length Average" in varNames
+        self.stemRatio = 0.01 if self.hasRoots else 0.05
+        self.computeMoments()
+
+    def computeMoments(self):
+        if not self.hasLeaf:
+            self.mean = self.values.get("Average")
+            self.variance = self.values.get("Standard Deviation")**2
+            return
+
+        leafMean, leafVar = getTruncatedNormalMoments(self.values.get("Total Leaf Surface Area Average"),
+                                                      self.values.get("Total Leaf Surface Area Standard Deviation"))
+        self.mean = 0.1*leafMean
+        self.variance = self.stemRatio**2*(leafVar + leafMean**2) + 0.01*leafVar
+        if self.hasFlower:
+            self.mean += self.values.get("Flower Petal Height Average")
+            self.variance += self.values.get("Flower Petal Height Standard Deviation")**2
+        if self.hasRoots:
+            self.mean += self.values.get("Roots Length Average")
+            self.variance += self.values.get("Roots Length Standard Deviation")**2
+
+    def getExpectedReward(self):
+        return self.mean
+
+    def getRewardVariance(self):
+        return self.variance
+
+    # Variance of getSampleReward(trials), the average of trials independent rewards
+    def getSampleRewardVariance(self, trials):
+        return self.variance/trials
+
+    # Vectorised equivalent of getSampleReward(trials), kept as a fallback and cross-check
+    def getSampleReward(self, trials):
+        trials = int(trials)
+        if not self.hasLeaf:
+            return np.mean(np.random.normal(self.values.get("Average"), self.values.get("Standard Deviation"), trials))
+
+        lsaavg = self.values.get("Total Leaf Surface Area Average")
+        lsastdev = self.values.get("Total Leaf Surface Area Standard Deviation")
+        leafSA = np.random.normal(lsaavg, lsastdev, trials)
+        rejected = leafSA < 0
+        while np.any(rejected):
+            leafSA[rejected] = np.random.normal(lsaavg, lsastdev, np.count_nonzero(rejected))
+            rejected = leafSA < 0
+        reward = np.random.normal(0.1*leafSA, self.stemRatio*leafSA)
+        if self.hasFlower:
+            reward += np.random.normal(self.values.get("Flower Petal Height Average"),
+                                       self.values.get("Flower Petal Height Standard Deviation"), trials)
+        if self.hasRoots:
+            reward += np.random.normal(self.values.get("Roots Length Average"),
+                                       self.values.get("Roots Length Standard Deviation"), trials)
+        return np.mean(reward)
@@ -0,0 +1,38 @@
+from statistics import NormalDist
+import math
+
+'''
+Closed-form objective coefficients for the linear-Gaussian tulip models:
+    - "SAA":        sample average approximation (the original Monte Carlo objective)
+    - "Expected":   exact expectation, E[avg + stdev*Z] = avg
+    - "Mean-Stdev": mean - k*stdev, riskParam = k
+    - "CVaR":       lower-tail CVaR at level alpha, riskParam = alpha
+NOTES:
+    - For a Gaussian reward, CVaR_alpha = mean - stdev*pdf(inv_cdf(alpha))/alpha (exact)
+    - For a reward that is only known through its mean and stdev (e.g. the leaf*stem product term),
+      mean - stdev*sqrt((1 - alpha)/alpha) is the worst-case CVaR over all such distributions
+'''
+
+ObjectiveModes = ["SAA", "Expected", "Mean-Stdev", "CVaR"]
+
+def checkObjectiveMode(objective, riskParam):
+    if objective not in ObjectiveModes:
+        raise ValueError("Unknown objective mode: " + str(objective))
+    if objective == "Mean-Stdev" and (riskParam is None or riskParam < 0):
+        raise ValueError("Mean-Stdev objective needs riskParam = k >= 0")
+    if objective == "CVaR" and (riskParam is None or not 0 < riskParam < 1):
+        raise ValueError("CVaR objective needs riskParam = alpha in (0, 1)")
+
+def getGaussianCVaRRatio(alpha):
+    return NormalDist().pdf(NormalDist().inv_cdf(alpha))/alpha
+
+def getWorstCaseCVaRRatio(alpha):
+    return math.sqrt((1 - alpha)/alpha)
+
+# Coefficient on the standard deviation of the reward for each risk mode
+def getStdevPenalty(objective, riskParam, gaussian = True):
+    if objective == "Mean-Stdev":
+        return riskParam
+    elif objective == "CVaR":
+        return getGaussianCVaRRatio(riskParam) if gaussian else getWorstCaseCVaRRatio(riskParam)
+    return 0.0
@@ -0,0 +1,324 @@
+from gurobipy import *
+import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ScenarioReduction import ScenarioReducer
+from AnytimeSolve import SolvePolicy
+
+'''
+L-shaped (Benders) decomposition for SAA models that keep one recourse block per sample:
+    max  f(x) + (1/n)*sum_j Q_j(x)
+    - buildMaster(model) adds the first-stage variables and constraints and returns
+      (firstStageVars, firstStageObj) where firstStageVars is a dict {name : Var}
+    - buildRecourse(model, copies, scenarios) adds the recourse variables and constraints for
+      a block of scenarios (rows of the scenario array) and returns the block objective
+      (the sum over its scenarios, NOT the average). copies is a dict {name : Var} of local
+      copies of the first-stage variables, fixed by the engine to the current master solution
+    - With weighted scenarios (e.g. from ScenarioReducer), buildRecourse is also passed the weights
+      of its block scaled by n, so the block objective is sum_j (n*p_j)*Q_j and uniform weights are all 1
+NOTES:
+    - Cuts are built from the duals of the copy-fixing rows of the LP relaxation of each block.
+      The relaxation over-estimates Q_j, so the cuts are valid even with integer recourse, but
+      the gap only closes fully when the recourse is an LP
+    - With integer recourse and an all-binary first stage, integer L-shaped (Laporte-Louveaux) cuts
+      theta_g <= Q_g(x^k) + (thetaBound - Q_g(x^k))*(Hamming distance of x to x^k) are added as well,
+      which makes the method exact (thetaBound must bound every group's recourse)
+    - Otherwise (integer recourse, continuous first stage, e.g. the AAAI-17 example) the method is a
+      heuristic: self.exact is False, the best first stage is feasible and getGap() is a valid bound on
+      its suboptimality, but the gap need not close. The loop stops (self.stalled) as soon as the master
+      returns a first stage it has already evaluated, since its LP cuts can then no longer move the bound
+    - Recourse is assumed to be relatively complete (every master solution has a feasible recourse)
+    - Gurobi environments are not thread-safe, so the blocks are spread over one private Env per worker
+      and each worker only ever optimizes the blocks of its own Env; the master stays on the default Env
+    - With timeLimit (seconds), every master and block optimize gets the remaining budget as its TimeLimit
+      (through SolvePolicy). When it runs out, the loop stops and returns the best first stage found so
+      far with its bounds; self.truncated records that the gap did not close
+'''
+
+class ScenarioDecomposition:
+    def __init__(self, name, buildMaster, buildRecourse, scenarios, blockSize = 1, cutGroups = None,
+                 workers = 4, tol = 1e-4, maxIters = 100, thetaBound = 1e4, weights = None, timeLimit = None,
+                 integerCuts = None):
+        self.name = name
+        self.buildMaster = buildMaster
+        self.buildRecourse = buildRecourse
+        self.scenarios = np.asarray(scenarios)
+        self.n = len(self.scenarios)
+        self.weights = None if weights is None else self.n*np.asarray(weights, dtype = float)/np.sum(weights)
+        self.blockSize = int(blockSize)
+        self.cutGroups = cutGroups
+        self.workers = workers
+        self.tol = tol
+        self.maxIters = maxIters
+        self.thetaBound = thetaBound
+        self.timeLimit = timeLimit
+        self.lowerBounds = list()
+        self.upperBounds = list()
+        self.buildMasterModel()
+        self.buildSubproblems()
+
+        # Integer L-shaped cuts need a binary first stage; by default they are used whenever they apply
+        integerRecourse = any(block.get("Model").IsMIP for block in self.blocks)
+        binaryFirstStage = all(v.VType == GRB.BINARY for v in self.firstStageVars.values())
+        if integerCuts and not binaryFirstStage:
+            raise ValueError("Integer L-shaped cuts need an all-binary first stage")
+        self.integerCuts = integerRecourse and binaryFirstStage if integerCuts is None else bool(integerCuts)
+        self.exact = not integerRecourse or self.integerCuts
+
+    def buildMasterModel(self):
+        self.master = Model(self.name + " Master")
+        self.master.setParam('OutputFlag', 0)
+        self.firstStageVars, self.firstStageObj = self.buildMaster(self.master)
+
+        # Cut aggregation: cutGroups = 1 is the single-cut method, None gives one cut per block
+        numBlocks = int(np.ceil(self.n/self.blockSize))
+        groups = numBlocks if self.cutGroups is None else min(int(self.cutGroups), numBlocks)
+        self.blockGroup = np.arange(numBlocks) % groups
+        self.thetas = [self.master.addVar(lb = -1*GRB.INFINITY, ub = self.thetaBound, name = "Theta " + str(g))
+                       for g in range(groups)]
+        self.master.setObjective(self.firstStageObj + quicksum(self.thetas), GRB.MAXIMIZE)
+        self.master.update()
+
+    def buildSubproblems(self):
+        self.envs = list()
+        for worker in range(max(1, min(self.workers, int(np.ceil(self.n/self.blockSize))))):
+            env = Env(empty = True)
+            env.setParam('OutputFlag', 0)
+            env.start()
+            self.envs.append(env)
+        self.blocks = list()
+        start = 0
+        while start < self.n:
+            scenarios = self.scenarios[start:start + self.blockSize]
+            worker = len(self.blocks) % len(self.envs)
+            sub = Model(self.name + " Block " + str(len(self.blocks)), env = self.envs[worker])
+            sub.setParam('OutputFlag', 0)
+            sub.setParam('Threads', 1)
+            copies = {}
+            for varName in self.firstStageVars:
+                copies[varName] = sub.addVar(lb = -1*GRB.INFINITY, ub = GRB.INFINITY, name = varName)
+            if self.weights is None:
+                blockObj = self.buildRecourse(sub, copies, scenarios)
+            else:
+                blockObj = self.buildRecourse(sub, copies, scenarios, self.weights[start:start + self.blockSize])
+            sub.setObjective(blockObj, GRB.MAXIMIZE)
+            for varName in copies:
+                sub.addConstr(copies[varName] == 0, name = "Fix " + varName)
+            sub.update()
+
+            # The relaxation is kept alongside the block so that both can be warm started
+            relaxed = sub.relax() if sub.IsMIP else sub
+            relaxed.setParam('OutputFlag', 0)
+            relaxed.setParam('Threads', 1)
+            self.blocks.append({"Model": sub,
+                                "Relaxed": relaxed,
+                                "Weight": 1/self.n,
+                                "Worker": worker})
+            start += self.blockSize
+
+    # Seconds left of timeLimit (None without one)
+    def getRemaining(self, start_time):
+        if self.timeLimit is None:
+            return None
+        return max(self.timeLimit - (time.time() - start_time), 0.0)
+
+    # (MIP value, relaxed value, slopes) of a block. When the time limit stops it, the relaxed value and
+    # slopes are None and the value is the incumbent recourse (a lower bound), or the result is None without one
+    def solveBlock(self, block, firstStage, timeLimit = None):
+        sub = block.get("Model")
+        relaxed = block.get("Relaxed")
+        for varName in firstStage:
+            sub.getConstrByName("Fix " + varName).RHS = firstStage[varName]
+            if relaxed is not sub:
+                relaxed.getConstrByName("Fix " + varName).RHS = firstStage[varName]
+
+        policy = SolvePolicy(timeLimit = timeLimit, planVars = list(firstStage))
+        policy.optimize(sub)
+        if sub.Status == GRB.TIME_LIMIT:
+            return (sub.objVal, None, None) if sub.SolCount > 0 else None
+        if sub.Status != GRB.OPTIMAL:
+            raise ValueError(sub.ModelName + " has no optimal recourse (status " + str(sub.Status) + ")")
+        value = sub.objVal
+        if relaxed is not sub:
+            policy.optimize(relaxed)
+            if relaxed.Status == GRB.TIME_LIMIT:
+                return value, None, None
+        slopes = {varName: relaxed.getConstrByName("Fix " + varName).Pi for varName in firstStage}
+        return value, relaxed.objVal, slopes
+
+    # Results for every block, each worker solving the blocks of its own Env in turn
+    def solveBlocks(self, pool, firstStage, start_time):
+        def solveWorker(worker):
+            return [(index, self.solveBlock(block, firstStage, self.getRemaining(start_time)))
+                    for index, block in enumerate(self.blocks) if block.get("Worker") == worker]
+        results = [None]*len(self.blocks)
+        for workerResults in pool.map(solveWorker, range(len(self.envs))):
+            for index, result in workerResults:
+                results[index] = result
+        return results
+
+    def solve(self):
+        self.bestObj = -1*GRB.INFINITY
+        self.bestFirstStage = None
+        self.truncated = False
+        self.stalled = False
+        visited = set()
+        start_time = time.time()
+        pool = ThreadPoolExecutor(max_workers = len(self.envs))
+        try:
+            iteration = 0
+            while iteration < self.maxIters:
+                # Warm start the master from the incumbent
+                if self.bestFirstStage is not None:
+                    for varName in self.firstStageVars:
+                        self.firstStageVars[varName].Start = self.bestFirstStage[varName]
+                master = SolvePolicy(timeLimit = self.getRemaining(start_time),
+                                     planVars = list(self.firstStageVars)).optimize(self.master)
+                if master.get("Time Limit Hit"):
+                    # Cuts only tighten the master, so the previous bound still holds if this one is weaker
+                    if master.get("Bound") is not None:
+                        self.lowerBounds.append(self.bestObj)
+                        self.upperBounds.append(min([master.get("Bound")] + self.upperBounds[-1:]))
+                    self.truncated = True
+                    break
+                upperBound = self.master.objVal
+                firstStage = {varName: self.firstStageVars[varName].x for varName in self.firstStageVars}
+                firstObj = self.firstStageObj.getValue() if hasattr(self.firstStageObj, "getValue") else self.firstStageObj
+                point = tuple(np.round([firstStage[varName] for varName in self.firstStageVars], 9))
+                if point in visited and not self.exact:
+                    self.lowerBounds.append(self.bestObj)
+                    self.upperBounds.append(upperBound)
+                    self.stalled = True
+                    break
+                visited.add(point)
+
+                results = self.solveBlocks(pool, firstStage, start_time)
+                if any(result is None for result in results):
+                    self.lowerBounds.append(self.bestObj)
+                    self.upperBounds.append(upperBound)
+                    self.truncated = True
+                    break
+
+                # Evaluate the exact recourse of the master solution (a lower bound on it for timed-out blocks)
+                lowerBound = firstObj + sum(block.get("Weight")*result[0] for block, result in zip(self.blocks, results))
+                if lowerBound > self.bestObj:
+                    self.bestObj = lowerBound
+                    self.bestFirstStage = firstStage
+                self.lowerBounds.append(self.bestObj)
+                self.upperBounds.append(upperBound)
+                if upperBound - self.bestObj <= self.tol*max(1.0, abs(self.bestObj)):
+                    break
+                if any(result[1] is None for result in results):
+                    self.truncated = True
+                    break
+                if self.timeLimit is not None and time.time() - start_time >= self.timeLimit:
+                    self.truncated = True
+                    break
+
+                # Add one optimality cut per group of blocks
+                cuts = [LinExpr() for theta in self.thetas]
+                for group, block, result in zip(self.blockGroup, self.blocks, results):
+                    weight = block.get("Weight")
+                    cuts[group] += weight*result[1]
+                    for varName in firstStage:
+                        cuts[group] += weight*result[2][varName]*(self.firstStageVars[varName] - firstStage[varName])
+                for theta, cut in zip(self.thetas, cuts):
+                    self.master.addConstr(theta <= cut)
+                if self.integerCuts:
+                    self.addIntegerCuts(firstStage, results)
+                iteration += 1
+        finally:
+            pool.shutdown()
+        self.iterations = len(self.upperBounds)
+        closed = self.getGap() <= self.tol*max(1.0, abs(self.bestObj))
+        self.truncated = not closed and (self.truncated or self.iterations == self.maxIters)
+        return self.bestFirstStage
+
+    # Laporte-Louveaux cuts at the binary point firstStage, one per group of blocks
+    def addIntegerCuts(self, firstStage, results):
+        values = np.zeros(len(self.thetas))
+        for group, block, result in zip(self.blockGroup, self.blocks, results):
+            values[group] += block.get("Weight")*result[0]
+        distance = quicksum(1 - self.firstStageVars[varName] if firstStage[varName] > 0.5 else self.firstStageVars[varName]
+                            for varName in firstStage)
+        for theta, value in zip(self.thetas, values):
+            self.master.addConstr(theta <= value + (self.thetaBound - value)*distance)
+
+    def getVar(self, varName):
+        return self.bestFirstStage.get(varName)
+
+    def getObj(self):
+        return self.bestObj
+
+    def getGap(self):
+        if len(self.upperBounds) == 0:
+            return GRB.INFINITY
+        return self.upperBounds[-1] - self.bestObj
+
+
+# AAAI-17 example with one recourse block per sampled z' instead of the averaged zprime
+def buildAAAI17Master(x):
+    def buildMaster(model):
+        xprime = model.addVar(lb = 0, ub = 1, name = "x'")
+        action = model.addVar(lb = 0, ub = GRB.INFINITY, name = "a")
+        xinter = model.addVar(lb = 0, ub = GRB.INFINITY, name = "xinter")
+        bxinter = model.addVar(vtype = GRB.BINARY, name = "bxinter")
+        bxprime = model.addVar(vtype = GRB.BINARY, name = "bxprime")
+        M = 1000
+
+        # xinter constraints
+        model.addConstr(0.2*x + 0.7*action >= -1*M*(1 - bxinter))
+        model.addConstr(xinter <= 0.2*x + 0.7*action + M*(1 - bxinter))
+        model.addConstr(xinter >= 0.2*x + 0.7*action - M*(1 - bxinter))
+        model.addConstr(0.2*x + 0.7*action <= M*bxinter)
+        model.addConstr(xinter <= M*bxinter)
+        model.addConstr(xinter >= -1*M*bxinter)
+
+        # xprime constraints
+        model.addConstr(xinter <= 1 + M*(1 - bxprime))
+        model.addConstr(xprime <= xinter + M*(1 - bxprime))
+        model.addConstr(xprime >= xinter - M*(1 - bxprime))
+        model.addConstr(xinter >= 1 - M*bxprime)
+        model.addConstr(xprime <= 1 + M*bxprime)
+        model.addConstr(xprime >= 1 - M*bxprime)
+        return {"x'": xprime, "a": action}, 0.0
+    return buildMaster
+
+def buildAAAI17Recourse(x):
+    def buildRecourse(model, copies, norms, weights = None):
+        xprime = copies.get("x'")
+        action = copies.get("a")
+        M = 1000
+        obj = LinExpr()
+        if weights is None:
+            weights = np.ones(len(norms))
+        for norm, weight in zip(norms, weights):
+            breward = model.addVar(vtype = GRB.BINARY)
+            reward = model.addVar(lb = 0, ub = 1)
+
+            # If breward = 1, x < z' = x + a*norm and so reward = x', else reward = 1 - x'
+            # Both x' and the reward lie in [0, 1], so the reward rows only need M = 1
+            model.addConstr(x + action*float(norm) >= x + 10e-6 - M*(1 - breward))
+            model.addConstr(reward <= xprime + (1 - breward))
+            model.addConstr(reward >= xprime - (1 - breward))
+            model.addConstr(x + action*float(norm) <= x + M*breward)
+            model.addConstr(reward <= 1 - xprime + breward)
+            model.addConstr(reward >= 1 - xprime - breward)
+            obj += float(weight)*reward
+        return obj
+    return buildRecourse
+
+# With reducedScenarios = k, the n samples are first compressed to k weighted scenarios
+def solveAAAI17Step(x, n, randomSeed, blockSize = 100, cutGroups = None, workers = 4, reducedScenarios = None, timeLimit = None):
+    np.random.seed(randomSeed)
+    norms = np.random.standard_normal(n)
+    weights = None
+    if reducedScenarios is not None:
+        reducer = ScenarioReducer(norms, reducedScenarios, randomSeed = randomSeed)
+        norms = reducer.getScenarios()[:, 0]
+        weights = reducer.getWeights()
+    engine = ScenarioDecomposition("AAAI17-SAA", buildAAAI17Master(x), buildAAAI17Recourse(x), norms,
+                                   blockSize = blockSize, cutGroups = cutGroups, workers = workers, weights = weights,
+                                   timeLimit = timeLimit)
+    engine.solve()
+    return engine
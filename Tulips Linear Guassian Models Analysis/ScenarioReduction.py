@@ -0,0 +1,123 @@
+import numpy as np
+
+'''
+Scenario reduction: compress n weighted samples to k weighted representative scenarios
+    - "Forward": fast forward selection (Heitsch & Roemisch), keeps k of the original samples
+    - "KMeans": mini-batch k-means (Sculley), scenarios are cluster centres
+    - Every sample's probability is moved to its nearest scenario, and the cost of that move,
+      sum_i p_i*||x_i - nearest scenario||, is the Kantorovich (Wasserstein-1) distance between the
+      original and the reduced distribution, reported as self.distance
+NOTES:
+    - Samples are rows, e.g. the joint (leaf, stem, flower, roots) standard normal draws
+    - Each forward selection step costs O(candidates) per sample the last selection moved closer (all n
+      on the first step, fewer as k grows), so large samples use a random candidate subset (of at least
+      k samples)
+'''
+
+def getJointNormals(randomSeed, n, components = 4):
+    rng = np.random.default_rng(randomSeed)
+    return rng.standard_normal((int(n), components))
+
+# Nearest centre and distance for every sample, in chunks to bound memory
+def assignNearest(samples, centres, chunkSize = 8192):
+    nearest = np.empty(len(samples), dtype = int)
+    distances = np.empty(len(samples))
+    centreNorms = np.sum(centres**2, axis = 1)
+    start = 0
+    while start < len(samples):
+        chunk = samples[start:start + chunkSize]
+        squared = np.sum(chunk**2, axis = 1)[:, None] - 2*chunk @ centres.T + centreNorms[None, :]
+        nearest[start:start + chunkSize] = np.argmin(squared, axis = 1)
+        distances[start:start + chunkSize] = np.sqrt(np.maximum(np.min(squared, axis = 1), 0))
+        start += chunkSize
+    return nearest, distances
+
+class ScenarioReducer:
+    def __init__(self, samples, k, method = "Forward", weights = None, randomSeed = None,
+                 candidates = 512, batchSize = 1024, iterations = 100):
+        self.samples = np.asarray(samples, dtype = float)
+        if self.samples.ndim == 1:
+            self.samples = self.samples[:, None]
+        self.n = len(self.samples)
+        self.k = min(int(k), self.n)
+        self.method = method
+        self.probs = np.full(self.n, 1/self.n) if weights is None else np.asarray(weights, dtype = float)/np.sum(weights)
+        self.rng = np.random.default_rng(randomSeed)
+        self.candidates = candidates
+        self.batchSize = batchSize
+        self.iterations = iterations
+        self.reduce()
+
+    def reduce(self):
+        if self.method == "Forward":
+            self.scenarios = self.samples[self.forwardSelection()]
+        elif self.method == "KMeans":
+            self.scenarios = self.miniBatchKMeans()
+        else:
+            raise ValueError("Unknown scenario reduction method: " + str(self.method))
+
+        # Redistribute the probability of every sample to its nearest scenario
+        nearest, distances = assignNearest(self.samples, self.scenarios)
+        self.weights = np.bincount(nearest, weights = self.probs, minlength = self.k)
+        self.distance = np.sum(self.probs*distances)
+
+    def forwardSelection(self):
+        # The pool holds at least k candidates, so k distinct scenarios can always be selected
+        size = max(self.candidates, self.k)
+        if self.n > size:
+            pool = self.rng.choice(self.n, size = size, replace = False)
+        else:
+            pool = np.arange(self.n)
+        # Sample x candidate distances, computed once (float32 to halve the memory)
+        cost = np.empty((self.n, len(pool)), dtype = np.float32)
+        candidateNorms = np.sum(self.samples[pool]**2, axis = 1)
+        for start in range(0, self.n, 8192):
+            chunk = self.samples[start:start + 8192]
+            squared = np.sum(chunk**2, axis = 1)[:, None] - 2*chunk @ self.samples[pool].T + candidateNorms[None, :]
+            cost[start:start + 8192] = np.sqrt(np.maximum(squared, 0))
+
+        # z_u = sum_i p_i*min(closest_i, c(i, u)) for every candidate u. A selection only lowers closest_i
+        # for the samples nearer to it than to every earlier one, so z is updated over those rows alone,
+        # in chunks, instead of recomputing it from an n x candidates temporary every step
+        selected = list()
+        available = np.ones(len(pool), dtype = bool)
+        closest = np.full(self.n, np.inf, dtype = np.float32)
+        costs = self.probs @ cost
+        while len(selected) < self.k and np.any(available):
+            costs[~available] = np.inf
+            best = np.argmin(costs)
+            selected.append(pool[best])
+            available[best] = False
+            changed = np.flatnonzero(cost[:, best] < closest)
+            for start in range(0, len(changed), 8192):
+                rows = changed[start:start + 8192]
+                before = np.minimum(closest[rows, None], cost[rows])
+                after = np.minimum(cost[rows, best][:, None], cost[rows])
+                costs -= self.probs[rows] @ (before - after)
+            closest[changed] = cost[changed, best]
+        return np.asarray(selected)
+
+    def miniBatchKMeans(self):
+        centres = self.samples[self.rng.choice(self.n, size = self.k, replace = False, p = self.probs)].copy()
+        counts = np.zeros(self.k)
+        for iteration in range(self.iterations):
+            batch = self.samples[self.rng.choice(self.n, size = min(self.batchSize, self.n), p = self.probs)]
+            nearest, distances = assignNearest(batch, centres)
+            # Per-centre learning rate 1/count, applied batch-wise
+            batchCounts = np.bincount(nearest, minlength = self.k)
+            batchSums = np.zeros_like(centres)
+            np.add.at(batchSums, nearest, batch)
+            moved = batchCounts > 0
+            counts[moved] += batchCounts[moved]
+            rates = (batchCounts[moved]/counts[moved])[:, None]
+            centres[moved] = (1 - rates)*centres[moved] + rates*(batchSums[moved]/batchCounts[moved][:, None])
+        return centres
+
+    def getScenarios(self):
+        return self.scenarios
+
+    def getWeights(self):
+        return self.weights
+
+    def getDistance(self):
+        return self.distance
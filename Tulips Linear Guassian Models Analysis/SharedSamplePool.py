@@ -0,0 +1,122 @@
+import numpy as np
+from multiprocessing import shared_memory
+from NestedSampleStream import NestedSampleStream
+
+'''
+Sample pool shared zero-copy between sweep worker processes:
+    - The creating process draws each named stream once (same generators as NestedSampleStream, so the
+      pool holds exactly the samples a NestedSampleStream with the same seed would draw) into one
+      float64 block in multiprocessing.shared_memory, or in a memory-mapped file when path is given
+    - Each stream is stored as its samples followed by their prefix sums, so the mean of any
+      (stream, offset, length) slice costs O(1)
+    - Workers attach with SharedSamplePool.attach(pool.getSpec()); the spec is a plain dict, so it can be
+      passed to a Pool initializer or a process argument
+    - getStream(offset) is a NestedSampleStream stand-in (getMean(name, n)) for the V2 models, so trial t
+      of a sweep can use pool.getStream(t*n) and Stem, StemFlower and StemFlowerRoots runs share samples
+NOTES:
+    - Views are read-only; the creator must call unlink() once all workers are done
+'''
+
+DefaultStreams = {"Leaf": "normal", "Stem": "normal", "Flower": "normal", "Roots": "normal"}
+
+class SharedSamplePool:
+    def __init__(self, spec, buffer, handle, owner):
+        self.spec = spec
+        self.layout = spec.get("Layout")
+        self.handle = handle
+        self.owner = owner
+        self.data = np.ndarray((spec.get("Size"),), dtype = np.float64, buffer = buffer)
+
+    @classmethod
+    def create(cls, randomSeed, length, streams = None, path = None):
+        streams = DefaultStreams if streams is None else streams
+        length = int(length)
+        layout = {}
+        start = 0
+        for name in streams:
+            layout[name] = (start, length, streams.get(name))
+            start += 2*length + 1
+        spec = {"Random Seed": randomSeed, "Layout": layout, "Size": start, "Path": path}
+
+        if path is None:
+            handle = shared_memory.SharedMemory(create = True, size = max(8*start, 1))
+            spec["Name"] = handle.name
+            buffer = handle.buf
+        else:
+            handle = np.memmap(path, dtype = np.float64, mode = "w+", shape = (start,))
+            buffer = handle
+        pool = cls(spec, buffer, handle, True)
+
+        stream = NestedSampleStream(randomSeed)
+        for name, (start, length, distribution) in layout.items():
+            samples = stream.getSamples(name, length, distribution)
+            pool.data[start:start + length] = samples
+            pool.data[start + length] = 0.0
+            np.cumsum(samples, out = pool.data[start + length + 1:start + 2*length + 1])
+        if path is not None:
+            handle.flush()
+        pool.data.flags.writeable = False
+        return pool
+
+    @classmethod
+    def attach(cls, spec):
+        if spec.get("Path") is None:
+            try:
+                handle = shared_memory.SharedMemory(name = spec.get("Name"), track = False)
+            except TypeError:
+                handle = shared_memory.SharedMemory(name = spec.get("Name"))
+            buffer = handle.buf
+        else:
+            handle = np.memmap(spec.get("Path"), dtype = np.float64, mode = "r", shape = (spec.get("Size"),))
+            buffer = handle
+        pool = cls(spec, buffer, handle, False)
+        pool.data.flags.writeable = False
+        return pool
+
+    def getSpec(self):
+        return self.spec
+
+    def getBounds(self, name, offset, length):
+        start, size, distribution = self.layout.get(name)
+        if offset < 0 or offset + length > size:
+            raise ValueError("Samples %d:%d of stream %s are outside the pool (%d samples)" % (offset, offset + length, name, size))
+        return start
+
+    # Zero-copy view of samples offset..offset + length of a stream
+    def getView(self, name, offset, length):
+        start = self.getBounds(name, offset, length)
+        return self.data[start + offset:start + offset + length]
+
+    def getSum(self, name, offset, length):
+        start = self.getBounds(name, offset, length)
+        prefix = start + self.layout.get(name)[1]
+        return self.data[prefix + offset + length] - self.data[prefix + offset]
+
+    def getMean(self, name, n, offset = 0):
+        return self.getSum(name, offset, int(n))/int(n)
+
+    def getStream(self, offset = 0):
+        return PoolStream(self, offset)
+
+    def close(self):
+        # Views must not outlive the mapping
+        self.data = None
+        if isinstance(self.handle, shared_memory.SharedMemory):
+            self.handle.close()
+
+    def unlink(self):
+        self.close()
+        if self.owner and isinstance(self.handle, shared_memory.SharedMemory):
+            self.handle.unlink()
+
+# The slice of a pool starting at offset, with the NestedSampleStream interface the V2 models use
+class PoolStream:
+    def __init__(self, pool, offset):
+        self.pool = pool
+        self.offset = offset
+
+    def getSamples(self, name, n, distribution = None):
+        return self.pool.getView(name, self.offset, int(n))
+
+    def getMean(self, name, n, distribution = None):
+        return self.pool.getMean(name, n, self.offset)
@@ -0,0 +1,164 @@
+import numpy as np
+
+'''
+Bulk verification of solved tulip models (replaces the print-based testResults):
+    - A solution record is a plain dict of the variable values, the objective, the objective mode
+      and the sample means (see getSolutionRecord on the V2 models), so it can be kept in a results
+      store and verified later without Gurobi
+    - For a batch of records, every output (avg/stdev of each component) is recomputed from the
+      decisions and the parameter dicts, the SAA objective is recomputed from the outputs and the
+      sample means, and the budget, integrality and big-M rows are checked, all as NumPy columns
+    - Big-M activity is |output - (the other tulip type's expression)|/M for the relaxed branch; values
+      close to 1 mean M is almost binding and the big-M formulation may be cutting off solutions
+    - The V1 models keep no sample means and have no parameter dicts: getVariableRecord records their
+      variables with the objective marked "Unchecked", and V1Params holds their coefficients in the same
+      dict form (fromV1), so every check but the objective residual applies
+    - An empty batch gives a table of empty columns
+'''
+
+Features = {"Water": "Amount of Water/week (mL)",
+            "Outdoor": "Outdoor?",
+            "Pellets": "Number of Fertilizer Pellets"}
+
+# Output variable name for each (component, statistic), by the parameter prefix it is built from
+Outputs = {("Stem", "Avg"): "Average",
+           ("Stem", "Stdev"): "Standard Deviation",
+           ("Leaf", "Avg"): "Total Leaf Surface Area Average",
+           ("Leaf", "Stdev"): "Total Leaf Surface Area Standard Deviation",
+           ("Flower", "Avg"): "Flower Petal Height Average",
+           ("Flower", "Stdev"): "Flower Petal Height Standard Deviation",
+           ("Roots", "Avg"): "Roots Length Average",
+           ("Roots", "Stdev"): "Roots Length Standard Deviation"}
+
+# (red, purple, cost) parameters of the V1 models, transcribed from their constraints
+V1Stem = ({"Stem Base Avg": 15, "Stem Water Ratio Avg": 0.0012, "Stem Base Stdev": 5, "Stem Water Ratio Stdev": -0.001},
+          {"Stem Base Avg": 15, "Stem Water Ratio Avg": 0.001, "Stem Base Stdev": 10, "Stem Water Ratio Stdev": -0.005})
+V1Leaf = ({"Leaf Base Avg": 131, "Leaf Water Ratio Avg": 0.05, "Leaf Outdoor Ratio Avg": 20,
+           "Leaf Base Stdev": 65, "Leaf Water Ratio Stdev": -0.001, "Leaf Outdoor Ratio Stdev": 1},
+          {"Leaf Base Avg": 150, "Leaf Water Ratio Avg": 0.005, "Leaf Outdoor Ratio Avg": 5,
+           "Leaf Base Stdev": 30, "Leaf Water Ratio Stdev": -0.005, "Leaf Outdoor Ratio Stdev": 1})
+# 6 - 0.001*water + 2*(1 - outdoor) = 8 - 0.001*water - 2*outdoor (red), 8 - 0.0015*water + (1 - outdoor) (purple)
+V1Flower = ({"Flower Base Avg": 8, "Flower Water Ratio Avg": -0.001, "Flower Outdoor Ratio Avg": -2,
+             "Flower Base Stdev": 1.35, "Flower Outdoor Ratio Stdev": 1},
+            {"Flower Base Avg": 9, "Flower Water Ratio Avg": -0.0015, "Flower Outdoor Ratio Avg": -1,
+             "Flower Base Stdev": 0.75, "Flower Outdoor Ratio Stdev": 1})
+V1Roots = ({"Leaf Pellets Ratio Avg": -15, "Roots Base Avg": 15, "Roots Pellets Ratio Avg": 1.65, "Roots Outdoor Ratio Avg": 0.25,
+            "Roots Base Stdev": 1, "Roots Outdoor Ratio Stdev": 1},
+           {"Leaf Pellets Ratio Avg": -5, "Roots Base Avg": 16, "Roots Pellets Ratio Avg": 0.45, "Roots Outdoor Ratio Avg": 0.25,
+            "Roots Base Stdev": 2, "Roots Outdoor Ratio Stdev": 1})
+V1Costs = {"Red Tulip": 1.5, "Purple Tulip": 1.0, "Water": 0.015}
+V1Params = {"StemModel": (V1Stem[0], V1Stem[1], V1Costs),
+            "StemFlowerModel": (dict(V1Leaf[0], **V1Flower[0]), dict(V1Leaf[1], **V1Flower[1]), dict(V1Costs, Outdoor = 2)),
+            "StemFlowerRootsModel": (dict(V1Leaf[0], **V1Flower[0], **V1Roots[0]), dict(V1Leaf[1], **V1Flower[1], **V1Roots[1]),
+                                     dict(V1Costs, Outdoor = 2, Pellets = 0.05))}
+
+class SolutionVerifier:
+    def __init__(self, redParams, purpleParams, costParams, M = None, budget = 12, tol = 1e-4, activityLimit = 0.9):
+        self.redParams = redParams
+        self.purpleParams = purpleParams
+        self.costParams = costParams
+        self.M = M
+        self.budget = budget
+        self.tol = tol
+        self.activityLimit = activityLimit
+
+    @classmethod
+    def fromModel(cls, model, **kwargs):
+        return cls(model.redParams, model.purpleParams, model.costParams, **kwargs)
+
+    @classmethod
+    def fromV1(cls, modelClass, **kwargs):
+        return cls(*V1Params.get(modelClass.__name__), **kwargs)
+
+    # Record of any solved tulip model from its named variables (for models without getSolutionRecord)
+    @staticmethod
+    def getVariableRecord(model):
+        record = dict((v.VarName, v.x) for v in model.model.getVars() if v.VarName)
+        record["Objective"] = model.model.objVal
+        record["Objective Mode"] = "Unchecked"
+        return record
+
+    def getColumn(self, records, name, default = np.nan):
+        return np.array([record.get(name, default) for record in records], dtype = float)
+
+    def getExpected(self, params, component, statistic, columns):
+        expected = np.full(len(columns.get("Tulip Type")), float(params.get(component + " Base " + statistic, 0.0)))
+        for feature in Features:
+            ratio = params.get(component + " " + feature + " Ratio " + statistic)
+            if ratio is not None:
+                expected += ratio*columns.get(feature)
+        return expected
+
+    def verify(self, records):
+        if len(records) == 0:
+            self.table = dict((column, np.zeros(0)) for column in ["Max Abs Residual", "Max Rel Residual", "Max Big-M Activity",
+                                                                   "Objective Residual", "Budget Violation",
+                                                                   "Integrality Residual"])
+            self.table["Flagged"] = np.zeros(0, dtype = bool)
+            return self.table
+        columns = {"Tulip Type": self.getColumn(records, "Tulip Type")}
+        for feature in Features:
+            columns[feature] = self.getColumn(records, Features.get(feature), 0.0)
+        red = columns.get("Tulip Type") > 0.5
+        hasLeaf = "Total Leaf Surface Area Average" in records[0]
+        M = self.M if self.M is not None else (10000 if hasLeaf else 1000)
+
+        table = {"Max Abs Residual": np.zeros(len(records)),
+                 "Max Rel Residual": np.zeros(len(records)),
+                 "Max Big-M Activity": np.zeros(len(records))}
+        outputs = {}
+        for (component, statistic), varName in Outputs.items():
+            if varName not in records[0]:
+                continue
+            value = self.getColumn(records, varName)
+            redExpected = self.getExpected(self.redParams, component, statistic, columns)
+            purpleExpected = self.getExpected(self.purpleParams, component, statistic, columns)
+            expected = np.where(red, redExpected, purpleExpected)
+            other = np.where(red, purpleExpected, redExpected)
+            residual = np.abs(value - expected)
+            table[varName + " Residual"] = residual
+            table["Max Abs Residual"] = np.maximum(table.get("Max Abs Residual"), residual)
+            table["Max Rel Residual"] = np.maximum(table.get("Max Rel Residual"), residual/np.maximum(np.abs(expected), 1.0))
+            table["Max Big-M Activity"] = np.maximum(table.get("Max Big-M Activity"), np.abs(value - other)/M)
+            outputs[(component, statistic)] = expected
+
+        # SAA objective from the recomputed outputs and the recorded sample means
+        if hasLeaf:
+            leaf = outputs.get(("Leaf", "Avg")) + outputs.get(("Leaf", "Stdev"))*self.getColumn(records, "Leaf Sample Mean")
+            objective = 0.1*leaf + 0.05*leaf*self.getColumn(records, "Stem Sample Mean")
+            for component in ["Flower", "Roots"]:
+                if (component, "Avg") in outputs:
+                    objective += (outputs.get((component, "Avg"))
+                                  + outputs.get((component, "Stdev"))*self.getColumn(records, component + " Sample Mean"))
+        else:
+            objective = outputs.get(("Stem", "Avg")) + outputs.get(("Stem", "Stdev"))*self.getColumn(records, "Stem Sample Mean")
+        checked = np.array([record.get("Objective Mode", "SAA") in ["SAA", "Expected"] for record in records])
+        table["Objective Residual"] = np.where(checked, np.abs(self.getColumn(records, "Objective") - objective), np.nan)
+
+        # Budget and integrality
+        cost = (np.where(red, self.costParams.get("Red Tulip"), self.costParams.get("Purple Tulip"))
+                + self.costParams.get("Water")*columns.get("Water")
+                + self.costParams.get("Outdoor", 0.0)*(1 - columns.get("Outdoor"))
+                + self.costParams.get("Pellets", 0.0)*columns.get("Pellets"))
+        table["Budget Violation"] = np.maximum(cost - self.budget, 0.0)
+        integers = np.stack([columns.get("Tulip Type"), columns.get("Outdoor"), columns.get("Pellets")])
+        table["Integrality Residual"] = np.max(np.abs(integers - np.round(integers)), axis = 0)
+
+        objectiveResidual = np.nan_to_num(table.get("Objective Residual"))
+        table["Flagged"] = ((table.get("Max Rel Residual") > self.tol)
+                            | (objectiveResidual > self.tol*np.maximum(np.abs(objective), 1.0))
+                            | (table.get("Budget Violation") > self.tol)
+                            | (table.get("Integrality Residual") > self.tol)
+                            | (table.get("Max Big-M Activity") > self.activityLimit))
+        self.table = table
+        return table
+
+    def printSummary(self, table = None):
+        table = self.table if table is None else table
+        print("Verified " + str(len(table.get("Flagged"))) + " solutions, "
+              + str(int(np.sum(table.get("Flagged")))) + " flagged")
+        for column in ["Max Abs Residual", "Max Rel Residual", "Objective Residual",
+                       "Budget Violation", "Integrality Residual", "Max Big-M Activity"]:
+            values = table.get(column)
+            if np.any(~np.isnan(values)):
+                print("\t%s: %g" % (column, np.nanmax(values)))
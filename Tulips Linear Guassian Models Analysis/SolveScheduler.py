@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Core-aware scheduling of many Gurobi solves on one machine:
+    - Every solve holds as many cores as it has solver Threads, so the sum of Threads over running
+      solves never exceeds the core budget (no oversubscription)
+    - The first solve of each label runs single-threaded and its size (non-zeros of the model) is
+      recorded; later solves of that label get Threads/Method from the first tier whose size limit
+      covers the profile. Tiny tulip MILPs run one thread each and many at a time, large scenario
+      or horizon models get many threads and few concurrent slots
+    - build(solverParams) must build and solve the model and return an object with a .model
+      attribute (the Gurobi Model), e.g. StemFlowerRootsModel(..., solverParams = solverParams)
+    - build runs on a pool thread, and a Gurobi Env must not be shared by concurrent solves, so build
+      must create its Gurobi models in that thread's Env (AsyncSolve.getThreadEnv(), which the V2
+      models use in buildModel), not in the default Env
+    - For the same reason, anything read off the solved Gurobi model belongs in evaluate(result), which
+      submit runs on the same pool thread right after build; the future then resolves to its return
+      value (plain values) instead of the result
+    - Throughput is reported per (Threads, Method) configuration
+'''
+
+class SolveScheduler:
+    def __init__(self, cores = None, tiers = None):
+        self.cores = os.cpu_count() if cores is None else int(cores)
+        # (max non-zeros, Threads, Method): dual simplex for tiny models, concurrent for large ones
+        self.tiers = tiers if tiers is not None else [(1e4, 1, 1),
+                                                      (1e6, min(4, self.cores), -1),
+                                                      (float("inf"), self.cores, 3)]
+        self.free = self.cores
+        self.condition = threading.Condition()
+        self.profiles = {}
+        self.stats = {}
+        self.pool = ThreadPoolExecutor(max_workers = self.cores)
+        self.startTime = time.time()
+
+    def getParams(self, label):
+        size = self.profiles.get(label)
+        if size is None:
+            return {"Threads": 1}
+        for maxSize, threads, method in self.tiers:
+            if size <= maxSize:
+                return {"Threads": min(threads, self.cores), "Method": method}
+        return {"Threads": self.cores}
+
+    def acquire(self, threads):
+        with self.condition:
+            while self.free < threads:
+                self.condition.wait()
+            self.free -= threads
+
+    def release(self, threads):
+        with self.condition:
+            self.free += threads
+            self.condition.notify_all()
+
+    def run(self, label, build, evaluate = None):
+        params = self.getParams(label)
+        threads = params.get("Threads")
+        self.acquire(threads)
+        start_time = time.time()
+        try:
+            result = build(params)
+        finally:
+            self.release(threads)
+        elapsed = time.time() - start_time
+
+        if label not in self.profiles and hasattr(result, "model"):
+            self.profiles[label] = result.model.NumNZs
+        self.record((threads, params.get("Method", -1)), elapsed)
+        return result if evaluate is None else evaluate(result)
+
+    def record(self, config, elapsed):
+        with self.condition:
+            stats = self.stats.setdefault(config, {"Solves": 0, "Solve Time": 0.0})
+            stats["Solves"] += 1
+            stats["Solve Time"] += elapsed
+
+    def submit(self, label, build, evaluate = None):
+        return self.pool.submit(self.run, label, build, evaluate)
+
+    def getThroughput(self):
+        wallTime = time.time() - self.startTime
+        report = {}
+        for (threads, method), stats in self.stats.items():
+            report[(threads, method)] = {"Solves": stats.get("Solves"),
+                                         "Average Solve Time (s)": stats.get("Solve Time")/stats.get("Solves"),
+                                         "Solves/Core-Second": stats.get("Solves")/(stats.get("Solve Time")*threads),
+                                         "Solves/Second": stats.get("Solves")/wallTime}
+        return report
+
+    def printThroughput(self):
+        for (threads, method), stats in sorted(self.getThroughput().items()):
+            print("Threads = %d, Method = %d: %d solves, %.4f s/solve, %.2f solves/core-s, %.2f solves/s"
+                  % (threads, method, stats.get("Solves"), stats.get("Average Solve Time (s)"),
+                     stats.get("Solves/Core-Second"), stats.get("Solves/Second")))
+
+    def shutdown(self):
+        self.pool.shutdown()
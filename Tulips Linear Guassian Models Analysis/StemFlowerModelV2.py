@@ -1,12 +1,22 @@
 from gurobipy import *
 import numpy as np
+import time
+from AsyncSolve import submitSolve, getThreadEnv
+import math
+from RiskObjectives import checkObjectiveMode, getStdevPenalty
 
 class StemFlowerModel:
-    def __init__(self, name, randomSeed, n):
+    def __init__(self, name, randomSeed, n, stream = None, objective = "SAA", riskParam = None, solverParams = None, lazy = False):
+        checkObjectiveMode(objective, riskParam)
         self.name = name
         self.randomSeed = randomSeed
         self.n = int(n)
-        self.model = Model(self.name)
+        self.stream = stream
+        self.solverParams = {} if solverParams is None else solverParams
+        self.rng = np.random.RandomState(randomSeed)
+        self.objective = objective
+        self.riskParam = riskParam
+        self.model = None
         self.redParams = {"Leaf Base Avg" : 131,
                           "Leaf Water Ratio Avg" : 0.05,
                           "Leaf Outdoor Ratio Avg" : 20,
@@ -33,10 +43,16 @@ class StemFlowerModel:
                            "Purple Tulip": 1.0, 
                            "Water": 0.015,
                            "Outdoor": 2}
-        self.buildModel()
+        # lazy = True only records the inputs; the Gurobi model is created and built on the first solve()/solveAsync()
+        self.built = False
+        if not lazy:
+            self.solve()
     
     def buildModel(self):
+        self.model = Model(self.name, env = getThreadEnv())
         self.model.setParam('OutputFlag', 0)
+        for param in self.solverParams:
+            self.model.setParam(param, self.solverParams.get(param))
 
         # Create Variables 
         tulip_type = self.model.addVar(vtype = GRB.BINARY, name = "Tulip Type")
@@ -49,20 +65,8 @@ class StemFlowerModel:
         self.model.update()
         
         # Set objective 
-        i = 0
-        leaf = LinExpr()
-        stem = LinExpr()
-        flower = LinExpr()
-        while i < self.n:
-
-            leaf += lsaavg + lsastdev*np.random.standard_normal()
-            stem += 0.1*(lsa) + 0.05*(lsa)*np.random.standard_normal()
-            flower += flavg + flstdev*np.random.standard_normal()
-
-            i += 1
-
-        # Set objective
-        self.model.setObjective((1/self.n)*(stem + flower), GRB.MAXIMIZE)
+        self.drawSamples()
+        self.setSampleObjective()
 
         # Set constraints 
         M = 10000
@@ -126,8 +130,92 @@ class StemFlowerModel:
                              + self.costParams.get("Water")*water 
                              + self.costParams.get("Outdoor")*(1 - outdoor) <= 12)
 
-        # Optimize model
+        self.model.update()
+        self.built = True
+        
+    # Builds on first use and optimizes; runTime covers both, as when the constructor solved.
+    # With an AnytimeSolve.SolvePolicy the solve runs under its time/gap budgets
+    def solve(self, policy = None):
+        start_time = time.time()
+        if not self.built:
+            self.buildModel()
+        if policy is None:
+            self.model.optimize()
+        else:
+            policy.optimize(self.model, self.name)
+        end_time = time.time()
+        self.runTime = end_time - start_time
+        return self
+
+    # Future resolving to this model once solved, on executor (the shared AsyncSolve pool by default)
+    def solveAsync(self, executor = None, policy = None):
+        return submitSolve(self, executor, policy)
+        
+    def drawSamples(self):
+        # The analytic objectives need no samples (each sample mean is replaced by its expectation, 0)
+        if self.objective != "SAA":
+            self.lavg = 0.0
+            self.savg = 0.0
+            self.favg = 0.0
+        elif self.stream is None:
+            self.rng = np.random.RandomState(self.randomSeed)
+            lnorms = self.rng.standard_normal(self.n)
+            self.lavg = np.mean(lnorms)
+            snorms = self.rng.standard_normal(self.n)
+            self.savg = np.mean(snorms)
+            fnorms = self.rng.standard_normal(self.n)
+            self.favg = np.mean(fnorms)
+        else:
+            self.lavg = self.stream.getMean("Leaf", self.n)
+            self.savg = self.stream.getMean("Stem", self.n)
+            self.favg = self.stream.getMean("Flower", self.n)
+    
+    # The sample averages of each component collapse to avg + stdev*(sample mean)
+    def setSampleObjective(self):
+        lsaavg = self.model.getVarByName("Total Leaf Surface Area Average")
+        lsastdev = self.model.getVarByName("Total Leaf Surface Area Standard Deviation")
+        flavg = self.model.getVarByName("Flower Petal Height Average")
+        flstdev = self.model.getVarByName("Flower Petal Height Standard Deviation")
+        if self.objective == "SAA":
+            leaf = lsaavg + lsastdev*self.lavg
+            stem = 0.1*leaf + 0.05*leaf*self.savg
+            flower = flavg + flstdev*self.favg
+            self.model.setObjective(stem + flower, GRB.MAXIMIZE)
+        elif self.objective == "Expected":
+            # E[0.1*L + 0.05*L*S + F] = 0.1*lsaavg + flavg
+            self.model.setObjective(0.1*lsaavg + flavg, GRB.MAXIMIZE)
+        else:
+            # The leaf*stem product makes the height non-Gaussian, so the risk measures use its exact stdev
+            penalty = getStdevPenalty(self.objective, self.riskParam, gaussian = False)
+            self.model.setObjective(0.1*lsaavg + flavg - penalty*self.getHeightStdevVar(), GRB.MAXIMIZE)
+    
+    # Var(0.1*L + 0.05*L*S + F) = 0.01*lsastdev^2 + 0.0025*(lsaavg^2 + lsastdev^2) + flstdev^2,
+    # so the height stdev is the norm of a linear map of the outputs (a second-order cone)
+    def getHeightStdevVar(self):
+        height = self.model.getVarByName("Total Height Standard Deviation")
+        if height is not None:
+            return height
+        height = self.model.addVar(name = "Total Height Standard Deviation")
+        leafStdevTerm = self.model.addVar(name = "Leaf Stdev Height Term")
+        leafAvgTerm = self.model.addVar(name = "Leaf Average Height Term")
+        self.model.addConstr(leafStdevTerm == math.sqrt(0.0125)*self.model.getVarByName("Total Leaf Surface Area Standard Deviation"))
+        self.model.addConstr(leafAvgTerm == 0.05*self.model.getVarByName("Total Leaf Surface Area Average"))
+        flstdev = self.model.getVarByName("Flower Petal Height Standard Deviation")
+        self.model.addConstr(leafStdevTerm*leafStdevTerm + leafAvgTerm*leafAvgTerm + flstdev*flstdev <= height*height)
+        self.model.update()
+        return height
+    
+    # Grows the sample to n (prefix-consistent when built on a stream) and re-solves from the previous optimum
+    def extendSamples(self, n):
+        start_time = time.time()
+        for v in self.model.getVars():
+            v.Start = v.x
+        self.n = int(n)
+        self.drawSamples()
+        self.setSampleObjective()
         self.model.optimize()
+        end_time = time.time()
+        self.runTime = end_time - start_time
         
     def setRedParam(self, name, value):
         self.redParams.setDefaultValue(name, value)
@@ -144,15 +232,34 @@ class StemFlowerModel:
     def getObj(self):
         return self.model.objVal
     
+    def getRunTime(self):
+        return self.runTime
+    
+    def getOptimizationTime(self):
+        return self.model.Runtime
+    
+    def getSimplexIters(self):
+        return self.model.IterCount
+    
+    # Plain-dict record of the solution for bulk verification (see SolutionVerifier)
+    def getSolutionRecord(self):
+        record = dict((v.varName, v.x) for v in self.model.getVars())
+        record["Objective"] = self.getObj()
+        record["Objective Mode"] = self.objective
+        record.update({"Leaf Sample Mean": self.lavg,
+                       "Stem Sample Mean": self.savg,
+                       "Flower Sample Mean": self.favg})
+        return record
+    
     def getSampleReward(self, trials):
         i = 0
         avgReward = 0
         while i < trials: 
-            leafSA = np.random.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
+            leafSA = self.rng.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
             while leafSA < 0:
-                leafSA = np.random.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
-            stemHeight = np.random.normal(0.1*leafSA, 0.05*leafSA)
-            flHeight = np.random.normal(self.getVar("Flower Petal Height Average"), self.getVar("Flower Petal Height Standard Deviation"))
+                leafSA = self.rng.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
+            stemHeight = self.rng.normal(0.1*leafSA, 0.05*leafSA)
+            flHeight = self.rng.normal(self.getVar("Flower Petal Height Average"), self.getVar("Flower Petal Height Standard Deviation"))
             avgReward += stemHeight + flHeight 
             i += 1
         return avgReward/trials
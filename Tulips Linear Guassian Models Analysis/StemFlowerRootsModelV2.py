@@ -1,55 +1,70 @@
 from gurobipy import *
 import numpy as np
+import time
+from AsyncSolve import submitSolve, getThreadEnv
+
+RedParams = {"Leaf Base Avg" : 131,
+             "Leaf Water Ratio Avg" : 0.05,
+             "Leaf Outdoor Ratio Avg" : 20,
+             "Leaf Pellets Ratio Avg": -15,
+             "Leaf Base Stdev" : 65,
+             "Leaf Water Ratio Stdev": -0.001,
+             "Leaf Outdoor Ratio Stdev": 1,
+             "Flower Base Avg": 6,
+             "Flower Water Ratio Avg": -0.001,
+             "Flower Outdoor Ratio Avg": 2,
+             "Flower Base Stdev": 1.35,
+             "Flower Outdoor Ratio Stdev": 1,
+             "Roots Base Avg": 15,
+             "Roots Pellets Ratio Avg": 1.65,
+             "Roots Outdoor Ratio Avg": 0.25,
+             "Roots Base Stdev": 1,
+             "Roots Outdoor Ratio Stdev": 1}
+PurpleParams = {"Leaf Base Avg" : 150,
+                "Leaf Water Ratio Avg" : 0.005,
+                "Leaf Outdoor Ratio Avg" : 5,
+                "Leaf Pellets Ratio Avg": -5,
+                "Leaf Base Stdev" : 30,
+                "Leaf Water Ratio Stdev": -0.005,
+                "Leaf Outdoor Ratio Stdev": 1,
+                "Flower Base Avg": 8,
+                "Flower Water Ratio Avg": -0.0015,
+                "Flower Outdoor Ratio Avg": 1,
+                "Flower Base Stdev": 0.75,
+                "Flower Outdoor Ratio Stdev": 1,
+                "Roots Base Avg": 16,
+                "Roots Pellets Ratio Avg": 0.45,
+                "Roots Outdoor Ratio Avg": 0.25,
+                "Roots Base Stdev": 2,
+                "Roots Outdoor Ratio Stdev": 1}
+CostParams = {"Red Tulip" : 1.5, 
+              "Purple Tulip": 1.0, 
+              "Water": 0.015,
+              "Outdoor": 2,
+              "Pellets": 0.05}
 
 class StemFlowerRootsModel:
-    def __init__(self, name, randomSeed, n):
+    def __init__(self, name, randomSeed, n, stream = None, solverParams = None, lazy = False):
         self.name = name 
         self.randomSeed = randomSeed
         self.n = int(n)
-        self.model = Model(self.name)
-        self.redParams = {"Leaf Base Avg" : 131,
-                          "Leaf Water Ratio Avg" : 0.05,
-                          "Leaf Outdoor Ratio Avg" : 20,
-                          "Leaf Pellets Ratio Avg": -15,
-                          "Leaf Base Stdev" : 65,
-                          "Leaf Water Ratio Stdev": -0.001,
-                          "Leaf Outdoor Ratio Stdev": 1,
-                          "Flower Base Avg": 6,
-                          "Flower Water Ratio Avg": -0.001,
-                          "Flower Outdoor Ratio Avg": 2,
-                          "Flower Base Stdev": 1.35,
-                          "Flower Outdoor Ratio Stdev": 1,
-                          "Roots Base Avg": 15,
-                          "Roots Pellets Ratio Avg": 1.65,
-                          "Roots Outdoor Ratio Avg": 0.25,
-                          "Roots Base Stdev": 1,
-                          "Roots Outdoor Ratio Stdev": 1}
-        self.purpleParams = {"Leaf Base Avg" : 150,
-                          "Leaf Water Ratio Avg" : 0.005,
-                          "Leaf Outdoor Ratio Avg" : 5,
-                          "Leaf Pellets Ratio Avg": -5,
-                          "Leaf Base Stdev" : 30,
-                          "Leaf Water Ratio Stdev": -0.005,
-                          "Leaf Outdoor Ratio Stdev": 1,
-                          "Flower Base Avg": 8,
-                          "Flower Water Ratio Avg": -0.0015,
-                          "Flower Outdoor Ratio Avg": 1,
-                          "Flower Base Stdev": 0.75,
-                          "Flower Outdoor Ratio Stdev": 1,
-                          "Roots Base Avg": 16,
-                          "Roots Pellets Ratio Avg": 0.45,
-                          "Roots Outdoor Ratio Avg": 0.25,
-                          "Roots Base Stdev": 2,
-                          "Roots Outdoor Ratio Stdev": 1}
-        self.costParams = {"Red Tulip" : 1.5, 
-                           "Purple Tulip": 1.0, 
-                           "Water": 0.015,
-                           "Outdoor": 2,
-                           "Pellets": 0.05}
-        self.buildModel()
+        self.stream = stream
+        self.solverParams = {} if solverParams is None else solverParams
+        self.rng = np.random.RandomState(randomSeed)
+        self.model = None
+        self.redParams = dict(RedParams)
+        self.purpleParams = dict(PurpleParams)
+        self.costParams = dict(CostParams)
+        # lazy = True only records the inputs; the Gurobi model is created and built on the first solve()/solveAsync()
+        self.built = False
+        if not lazy:
+            self.solve()
         
     def buildModel(self):
+        self.model = Model(self.name, env = getThreadEnv())
         self.model.setParam('OutputFlag', 0)
+        for param in self.solverParams:
+            self.model.setParam(param, self.solverParams.get(param))
 
         # Create Variables 
         tulip_type = self.model.addVar(vtype = GRB.BINARY, name = "Tulip Type")
@@ -62,23 +77,11 @@ class StemFlowerRootsModel:
         flstdev = self.model.addVar(name = "Flower Petal Height Standard Deviation")
         roavg = self.model.addVar(name = "Roots Length Average")
         rostdev = self.model.addVar(name = "Roots Length Standard Deviation")
+        self.model.update()
         
         # Set objective 
-        np.random.seed(self.randomSeed)
-        lnorms = np.random.standard_normal(self.n)
-        self.lavg = np.mean(lnorms)
-        snorms = np.random.standard_normal(self.n)
-        self.savg = np.mean(snorms)
-        fnorms = np.random.standard_normal(self.n)
-        self.favg = np.mean(fnorms)
-        rnorms = np.random.standard_normal(self.n)
-        self.ravg = np.mean(rnorms)
-        
-        leaf = (1/self.n)*(sum(lsaavg + lsastdev*lnorm for lnorm in lnorms))
-        stem = (1/self.n)*(sum(0.1*leaf + 0.05*leaf*snorm for snorm in snorms))
-        flower = (1/self.n)*(sum(flavg + flstdev*fnorm for fnorm in fnorms))
-        roots = (1/self.n)*(sum(roavg + rostdev*rnorm for rnorm in rnorms))
-        self.model.setObjective(stem + flower + roots, GRB.MAXIMIZE)
+        self.drawSamples()
+        self.setSampleObjective()
         
 
         # Set constraints 
@@ -177,8 +180,66 @@ class StemFlowerRootsModel:
                              + self.costParams.get("Outdoor")*(1 - outdoor) 
                              + self.costParams.get("Pellets")*pellets <= 12)
 
-        # Optimize model
+        self.model.update()
+        self.built = True
+        
+    # Builds on first use and optimizes; runTime covers both, as when the constructor solved.
+    # With an AnytimeSolve.SolvePolicy the solve runs under its time/gap budgets
+    def solve(self, policy = None):
+        start_time = time.time()
+        if not self.built:
+            self.buildModel()
+        if policy is None:
+            self.model.optimize()
+        else:
+            policy.optimize(self.model, self.name)
+        end_time = time.time()
+        self.runTime = end_time - start_time
+        return self
+
+    # Future resolving to this model once solved, on executor (the shared AsyncSolve pool by default)
+    def solveAsync(self, executor = None, policy = None):
+        return submitSolve(self, executor, policy)
+        
+    def drawSamples(self):
+        if self.stream is None:
+            self.rng = np.random.RandomState(self.randomSeed)
+            lnorms = self.rng.standard_normal(self.n)
+            self.lavg = np.mean(lnorms)
+            snorms = self.rng.standard_normal(self.n)
+            self.savg = np.mean(snorms)
+            fnorms = self.rng.standard_normal(self.n)
+            self.favg = np.mean(fnorms)
+            rnorms = self.rng.standard_normal(self.n)
+            self.ravg = np.mean(rnorms)
+        else:
+            self.lavg = self.stream.getMean("Leaf", self.n)
+            self.savg = self.stream.getMean("Stem", self.n)
+            self.favg = self.stream.getMean("Flower", self.n)
+            self.ravg = self.stream.getMean("Roots", self.n)
+    
+    # The sample averages of each component collapse to avg + stdev*(sample mean)
+    def setSampleObjective(self):
+        leaf = (self.model.getVarByName("Total Leaf Surface Area Average") 
+                + self.model.getVarByName("Total Leaf Surface Area Standard Deviation")*self.lavg)
+        stem = 0.1*leaf + 0.05*leaf*self.savg
+        flower = (self.model.getVarByName("Flower Petal Height Average") 
+                  + self.model.getVarByName("Flower Petal Height Standard Deviation")*self.favg)
+        roots = (self.model.getVarByName("Roots Length Average") 
+                 + self.model.getVarByName("Roots Length Standard Deviation")*self.ravg)
+        self.model.setObjective(stem + flower + roots, GRB.MAXIMIZE)
+    
+    # Grows the sample to n (prefix-consistent when built on a stream) and re-solves from the previous optimum
+    def extendSamples(self, n):
+        start_time = time.time()
+        for v in self.model.getVars():
+            v.Start = v.x
+        self.n = int(n)
+        self.drawSamples()
+        self.setSampleObjective()
         self.model.optimize()
+        end_time = time.time()
+        self.runTime = end_time - start_time
         
     def setRedParam(self, name, value):
         self.redParams.setDefaultValue(name, value)
@@ -195,16 +256,36 @@ class StemFlowerRootsModel:
     def getObj(self):
         return self.model.objVal
     
+    def getRunTime(self):
+        return self.runTime
+    
+    def getOptimizationTime(self):
+        return self.model.Runtime
+    
+    def getSimplexIters(self):
+        return self.model.IterCount
+    
+    # Plain-dict record of the solution for bulk verification (see SolutionVerifier)
+    def getSolutionRecord(self):
+        record = dict((v.varName, v.x) for v in self.model.getVars())
+        record["Objective"] = self.getObj()
+        record["Objective Mode"] = "SAA"
+        record.update({"Leaf Sample Mean": self.lavg,
+                       "Stem Sample Mean": self.savg,
+                       "Flower Sample Mean": self.favg,
+                       "Roots Sample Mean": self.ravg})
+        return record
+    
     def getSampleReward(self, trials):
         i = 0
         avgReward = 0
         while i < trials:
-            leafSA = np.random.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
+            leafSA = self.rng.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
             while leafSA < 0:
-                leafSA = np.random.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
-            stemHeight = np.random.normal(0.1*leafSA, 0.01*leafSA)
-            flHeight = np.random.normal(self.getVar("Flower Petal Height Average"), self.getVar("Flower Petal Height Standard Deviation"))
-            roLength = np.random.normal(self.getVar("Roots Length Average"), self.getVar("Roots Length Standard Deviation"))
+                leafSA = self.rng.normal(self.getVar("Total Leaf Surface Area Average"), self.getVar("Total Leaf Surface Area Standard Deviation"))
+            stemHeight = self.rng.normal(0.1*leafSA, 0.01*leafSA)
+            flHeight = self.rng.normal(self.getVar("Flower Petal Height Average"), self.getVar("Flower Petal Height Standard Deviation"))
+            roLength = self.rng.normal(self.getVar("Roots Length Average"), self.getVar("Roots Length Standard Deviation"))
             avgReward += stemHeight + flHeight + roLength
             i += 1
         return avgReward/trials
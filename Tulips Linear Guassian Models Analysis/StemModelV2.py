@@ -1,12 +1,21 @@
 from gurobipy import *
 import numpy as np
+import time
+from AsyncSolve import submitSolve, getThreadEnv
+from RiskObjectives import checkObjectiveMode, getStdevPenalty
 
 class StemModel:
-    def __init__(self, name, randomSeed, n):
+    def __init__(self, name, randomSeed, n, stream = None, objective = "SAA", riskParam = None, solverParams = None, lazy = False):
+        checkObjectiveMode(objective, riskParam)
         self.name = name
         self.randomSeed = randomSeed
         self.n = int(n)
-        self.model = Model(self.name)
+        self.stream = stream
+        self.solverParams = {} if solverParams is None else solverParams
+        self.rng = np.random.RandomState(randomSeed)
+        self.objective = objective
+        self.riskParam = riskParam
+        self.model = None
         self.redParams = {"Stem Base Avg" : 15, 
                           "Stem Water Ratio Avg" : 0.0012, 
                           "Stem Base Stdev" : 5,
@@ -18,22 +27,27 @@ class StemModel:
         self.costParams = {"Red Tulip" : 1.5, 
                            "Purple Tulip": 1.0, 
                            "Water": 0.015}
-        self.buildModel()
+        # lazy = True only records the inputs; the Gurobi model is created and built on the first solve()/solveAsync()
+        self.built = False
+        if not lazy:
+            self.solve()
     
     def buildModel(self):
+        self.model = Model(self.name, env = getThreadEnv())
         self.model.setParam('OutputFlag', 0)
+        for param in self.solverParams:
+            self.model.setParam(param, self.solverParams.get(param))
         
         # Create Variables 
         tulip_type = self.model.addVar(vtype = GRB.BINARY, name = "Tulip Type")
         water = self.model.addVar(lb = 250, ub = 1000, name = "Amount of Water/week (mL)")
         avg = self.model.addVar(name = "Average")
         stdev = self.model.addVar(name = "Standard Deviation")
+        self.model.update()
         
         # Set Objective
-        np.random.seed(self.randomSeed)
-        norms = np.random.standard_normal(self.n)
-        self.navg = np.mean(norms)
-        self.model.setObjective((1/self.n)*(sum(avg + stdev*norm for norm in norms)), GRB.MAXIMIZE)
+        self.drawSamples()
+        self.setSampleObjective()
 
         # Set constraints 
         M = 1000
@@ -63,8 +77,60 @@ class StemModel:
                              + self.costParams.get("Purple Tulip")*(1 - tulip_type) 
                              + self.costParams.get("Water")*water <= 12)
         
-        # Optimize Model
+        self.model.update()
+        self.built = True
+        
+    # Builds on first use and optimizes; runTime covers both, as when the constructor solved.
+    # With an AnytimeSolve.SolvePolicy the solve runs under its time/gap budgets
+    def solve(self, policy = None):
+        start_time = time.time()
+        if not self.built:
+            self.buildModel()
+        if policy is None:
+            self.model.optimize()
+        else:
+            policy.optimize(self.model, self.name)
+        end_time = time.time()
+        self.runTime = end_time - start_time
+        return self
+
+    # Future resolving to this model once solved, on executor (the shared AsyncSolve pool by default)
+    def solveAsync(self, executor = None, policy = None):
+        return submitSolve(self, executor, policy)
+        
+    def drawSamples(self):
+        # The analytic objectives need no samples (the sample mean is replaced by its expectation, 0)
+        if self.objective != "SAA":
+            self.navg = 0.0
+        elif self.stream is None:
+            self.rng = np.random.RandomState(self.randomSeed)
+            norms = self.rng.standard_normal(self.n)
+            self.navg = np.mean(norms)
+        else:
+            self.navg = self.stream.getMean("Stem", self.n)
+    
+    # (1/n)*sum(avg + stdev*norm) collapses to avg + stdev*navg, and the stem height is Gaussian
+    # so the risk measures are linear in avg and stdev
+    def setSampleObjective(self):
+        avg = self.model.getVarByName("Average")
+        stdev = self.model.getVarByName("Standard Deviation")
+        if self.objective == "SAA":
+            self.model.setObjective(avg + stdev*self.navg, GRB.MAXIMIZE)
+        else:
+            penalty = getStdevPenalty(self.objective, self.riskParam)
+            self.model.setObjective(avg - penalty*stdev, GRB.MAXIMIZE)
+    
+    # Grows the sample to n (prefix-consistent when built on a stream) and re-solves from the previous optimum
+    def extendSamples(self, n):
+        start_time = time.time()
+        for v in self.model.getVars():
+            v.Start = v.x
+        self.n = int(n)
+        self.drawSamples()
+        self.setSampleObjective()
         self.model.optimize()
+        end_time = time.time()
+        self.runTime = end_time - start_time
         
     def setRedParam(self, name, value):
         self.redParams.setDefaultValue(name, value)
@@ -81,11 +147,28 @@ class StemModel:
     def getObj(self):
         return self.model.objVal
     
+    def getRunTime(self):
+        return self.runTime
+    
+    def getOptimizationTime(self):
+        return self.model.Runtime
+    
+    def getSimplexIters(self):
+        return self.model.IterCount
+    
+    # Plain-dict record of the solution for bulk verification (see SolutionVerifier)
+    def getSolutionRecord(self):
+        record = dict((v.varName, v.x) for v in self.model.getVars())
+        record["Objective"] = self.getObj()
+        record["Objective Mode"] = self.objective
+        record.update({"Stem Sample Mean": self.navg})
+        return record
+    
     def getSampleReward(self, trials):
         avgReward = 0
         i = 0
         while i < trials:
-            avgReward += np.random.normal(self.getVar("Average"), self.getVar("Standard Deviation"))
+            avgReward += self.rng.normal(self.getVar("Average"), self.getVar("Standard Deviation"))
             i += 1
         return avgReward/trials
     
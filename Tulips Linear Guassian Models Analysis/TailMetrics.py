@@ -0,0 +1,139 @@
+import math
+import numpy as np
+from statistics import NormalDist
+from NormalFunctions import getNormalCdf, getNormalPdf
+
+'''
+Importance-sampling estimates of the lower tail of the total height of a solved plan:
+    L      = lsaavg + lsastdev*Z, truncated to L >= 0 (getSampleReward redraws negative L)
+    height = L*(0.1 + stemRatio*Zs) + flavg + flstdev*Zf + roavg + rostdev*Zr
+    - getThresholdProbability(t) estimates P(height < t), getCVaR(alpha) the expected height in the worst
+      alpha fraction of outcomes (and the VaR)
+    - Given L the height is Gaussian, N(0.1*L + flavg + roavg, (stemRatio*L)^2 + flstdev^2 + rostdev^2), so
+      P(height < t | L) and E[height*1{height < t} | L] are closed form and only Z is sampled
+    - Z is drawn from the defensive mixture beta*N(0, 1) + (1 - beta)*N(shift, 1), with the shift at the
+      mode of phi(z)*P(height < t | z) (the most likely way to fall short), so the weights
+      phi(z)/q(z) are bounded by 1/beta. Weights are self-normalised over the draws with L >= 0,
+      which takes care of the truncation
+    - Draws come in vectorised batches until the relative error (delta-method standard error of the
+      ratio estimator over the estimate) reaches targetRelError or maxSamples is reached; for the CVaR
+      the batches after the first are sized from the current relative error
+NOTES:
+    - "Naive Relative Error" is the relative error plain Monte Carlo would have with the same samples,
+      sqrt((1 - p)/(p*n)), for comparison
+    - The CVaR standard error treats the estimated VaR as fixed
+'''
+
+class TailEvaluator:
+    def __init__(self, model, randomSeed = None, beta = 0.1):
+        values = dict((v.varName, v.x) for v in model.model.getVars())
+        if "Total Leaf Surface Area Average" not in values:
+            raise ValueError("Tail metrics need the leaf -> stem chain (StemFlowerModel or StemFlowerRootsModel)")
+        self.leafAvg = values.get("Total Leaf Surface Area Average")
+        self.leafStdev = values.get("Total Leaf Surface Area Standard Deviation")
+        self.stemRatio = 0.01 if "Roots Length Average" in values else 0.05
+        self.offset = values.get("Flower Petal Height Average", 0.0) + values.get("Roots Length Average", 0.0)
+        self.otherVariance = (values.get("Flower Petal Height Standard Deviation", 0.0)**2
+                              + values.get("Roots Length Standard Deviation", 0.0)**2)
+        self.beta = beta
+        self.rng = np.random.default_rng(randomSeed)
+
+    # Mean and stdev of the height given the leaf normal z, and the L >= 0 indicator
+    def getConditional(self, z):
+        leaf = self.leafAvg + self.leafStdev*z
+        return 0.1*leaf + self.offset, np.sqrt((self.stemRatio*leaf)**2 + self.otherVariance), leaf >= 0
+
+    def getShortfall(self, z, threshold):
+        mean, stdev, valid = self.getConditional(z)
+        return np.where(valid, getNormalCdf((threshold - mean)/np.maximum(stdev, 1e-300)), 0.0)
+
+    # Mode of phi(z)*P(height < threshold | z) on a grid
+    def getShift(self, threshold):
+        grid = np.linspace(-12, 12, 4801)
+        with np.errstate(divide = "ignore"):
+            logDensity = -0.5*grid**2 + np.log(self.getShortfall(grid, threshold))
+        return grid[np.argmax(logDensity)]
+
+    def drawBatch(self, shift, size):
+        size = int(size)
+        z = self.rng.standard_normal(size) + np.where(self.rng.random(size) < self.beta, 0.0, shift)
+        weights = 1/(self.beta + (1 - self.beta)*np.exp(shift*z - 0.5*shift**2))
+        return z, weights
+
+    def getThresholdProbability(self, threshold, batchSize = 4096, targetRelError = 0.05, maxSamples = 1000000):
+        shift = self.getShift(threshold)
+        sums = np.zeros(5)
+        samples = 0
+        while True:
+            z, weights = self.drawBatch(shift, batchSize)
+            weights = weights*self.getConditional(z)[2]
+            shortfall = self.getShortfall(z, threshold)
+            sums += [np.sum(weights), np.sum(weights*shortfall), np.sum(weights**2),
+                     np.sum(weights**2*shortfall), np.sum(weights**2*shortfall**2)]
+            samples += batchSize
+            estimate = sums[1]/sums[0]
+            variance = max((sums[4] - 2*estimate*sums[3] + estimate**2*sums[2])/sums[0]**2, 0.0)
+            relError = math.sqrt(variance)/estimate if estimate > 0 else float("inf")
+            if relError <= targetRelError or samples >= maxSamples:
+                break
+        return {"Estimate": estimate,
+                "Std Error": math.sqrt(variance),
+                "Relative Error": relError,
+                "Effective Sample Size": sums[0]**2/sums[2],
+                "Samples": samples,
+                "Naive Relative Error": math.sqrt((1 - estimate)/(estimate*samples)) if estimate > 0 else float("inf"),
+                "Shift": shift}
+
+    def getCVaR(self, alpha, batchSize = 4096, targetRelError = 0.01, maxSamples = 1000000):
+        meanHeight = 0.1*self.leafAvg + self.offset
+        stdevHeight = math.sqrt((0.1*self.leafStdev)**2 + (self.stemRatio*self.leafAvg)**2 + self.otherVariance)
+        shift = self.getShift(meanHeight + stdevHeight*NormalDist().inv_cdf(alpha))
+        zs = list()
+        allWeights = list()
+        size = batchSize
+        while True:
+            z, weights = self.drawBatch(shift, size)
+            zs.append(z)
+            allWeights.append(weights*self.getConditional(z)[2])
+            z = np.concatenate(zs)
+            weights = np.concatenate(allWeights)
+            mean, stdev, valid = self.getConditional(z)
+            stdev = np.maximum(stdev, 1e-300)
+
+            # VaR: weighted P(height <= v) = alpha, by Newton steps kept inside a bisection bracket
+            lower = meanHeight - 40*stdevHeight
+            upper = meanHeight + 40*stdevHeight
+            var = meanHeight + stdevHeight*NormalDist().inv_cdf(alpha)
+            for iteration in range(50):
+                a = (var - mean)/stdev
+                excess = np.sum(weights*getNormalCdf(a))/np.sum(weights) - alpha
+                if excess < 0:
+                    lower = var
+                else:
+                    upper = var
+                slope = np.sum(weights*getNormalPdf(a)/stdev)/np.sum(weights)
+                step = var - excess/slope if slope > 0 else 0.5*(lower + upper)
+                if not lower < step < upper:
+                    step = 0.5*(lower + upper)
+                if abs(step - var) <= 1e-10*max(1.0, abs(var)):
+                    var = step
+                    break
+                var = step
+
+            # E[height*1{height <= VaR} | L] = mean*Phi(a) - stdev*phi(a), a = (VaR - mean)/stdev
+            a = (var - mean)/stdev
+            partial = mean*getNormalCdf(a) - stdev*getNormalPdf(a)
+            cvar = np.sum(weights*partial)/(alpha*np.sum(weights))
+            variance = np.sum(weights**2*(partial - alpha*cvar)**2)/(alpha*np.sum(weights))**2
+            relError = math.sqrt(variance)/abs(cvar) if cvar != 0 else float("inf")
+            if relError <= targetRelError or len(z) >= maxSamples:
+                break
+            # The VaR pass covers every draw so far, so the next batch is sized from the relative error (~1/sqrt(n))
+            size = int(min(max(batchSize, len(z)*((relError/targetRelError)**2 - 1)*1.1), maxSamples - len(z)))
+        return {"Estimate": cvar,
+                "VaR": var,
+                "Std Error": math.sqrt(variance),
+                "Relative Error": relError,
+                "Effective Sample Size": np.sum(weights)**2/np.sum(weights**2),
+                "Samples": len(z),
+                "Shift": shift}